@@ -1,9 +1,21 @@
 import streamlit as st
 import pandas as pd
 import json
+import html
+import hmac
 from datetime import datetime
 from supabase import create_client, Client
 import io
+import csv
+import itertools
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 
 st.set_page_config(
     page_title="揭阳市临床药学分会 - 管理员后台",
@@ -12,11 +24,16 @@ st.set_page_config(
 )
 
 # ==================== Supabase配置 ====================
+@st.cache_resource
+def get_client(url, key) -> Client:
+    """创建Supabase客户端（进程内共享，页面重跑时不再重复创建）"""
+    return create_client(url, key)
+
 try:
     SUPABASE_URL = st.secrets["SUPABASE_URL"]
     SUPABASE_KEY = st.secrets["SUPABASE_KEY"]
     ADMIN_PASSWORD = st.secrets.get("ADMIN_PASSWORD", "admin123")
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    supabase: Client = get_client(SUPABASE_URL, SUPABASE_KEY)
 except Exception as e:
     st.error("⚠️ 数据库配置错误，请联系管理员")
     st.stop()
@@ -25,62 +42,404 @@ except Exception as e:
 def check_password():
     """验证管理员密码"""
     def password_entered():
-        if st.session_state["password"] == ADMIN_PASSWORD:
+        # 常量时间比较，避免按响应时间逐位猜测密码
+        if hmac.compare_digest(st.session_state["password"].encode(), ADMIN_PASSWORD.encode()):
             st.session_state["password_correct"] = True
             del st.session_state["password"]
         else:
             st.session_state["password_correct"] = False
 
-    if "password_correct" not in st.session_state:
-        st.markdown("## 🔐 管理员登录")
-        st.text_input(
-            "请输入管理员密码", 
-            type="password", 
-            on_change=password_entered, 
-            key="password"
-        )
-        return False
-    elif not st.session_state["password_correct"]:
-        st.markdown("## 🔐 管理员登录")
-        st.text_input(
-            "请输入管理员密码", 
-            type="password", 
-            on_change=password_entered, 
-            key="password"
-        )
-        st.error("❌ 密码错误")
-        return False
-    else:
+    if st.session_state.get("password_correct"):
         return True
+    
+    st.markdown("## 🔐 管理员登录")
+    st.text_input(
+        "请输入管理员密码", 
+        type="password", 
+        on_change=password_entered, 
+        key="password"
+    )
+    if "password_correct" in st.session_state:
+        st.error("❌ 密码错误")
+    return False
 
 # ==================== 数据库操作函数 ====================
-def get_all_data(table_name):
-    """获取所有数据"""
+def parse_image_urls(value):
+    """将image_urls字段解析为图片链接列表"""
+    # 列迁移为jsonb/text[]后PostgREST直接返回列表，无需再解析：
+    #   ALTER TABLE awards ALTER COLUMN image_urls TYPE jsonb USING image_urls::jsonb;
+    if isinstance(value, list):
+        return value
+    return json_loads(value or '[]')
+
+def prepare_rows(rows):
+    """查询结果统一处理：解析image_urls，颁奖单位为空时填充默认值"""
+    for row in rows:
+        if 'image_urls' in row:
+            row['image_urls'] = parse_image_urls(row['image_urls'])
+        if 'award_organization' in row:
+            row['award_organization'] = row['award_organization'] or '未填写'
+    return rows
+
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_table(table_name, unit_name=None, columns="*"):
+    """查询数据表（缓存60秒，异常不缓存），image_urls在此统一解析一次"""
+    query = supabase.table(table_name).select(columns)
+    if unit_name:
+        query = query.eq("unit_name", unit_name)
+    return prepare_rows(query.execute().data)
+
+# 分类汇总每页显示的记录数
+PAGE_SIZE = 25
+
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_page(table_name, page, page_size=PAGE_SIZE):
+    """分页查询数据表（按id排序，缓存60秒），返回 (当前页数据, 总记录数)"""
+    offset = (page - 1) * page_size
+    result = supabase.table(table_name).select("*", count="exact").order("id").range(offset, offset + page_size - 1).execute()
+    return prepare_rows(result.data), result.count or 0
+
+def get_all_data(table_name, columns="*"):
+    """获取所有数据（columns为逗号分隔的字段名，只统计数量时传"unit_name"即可）"""
     try:
-        result = supabase.table(table_name).select("*").execute()
-        return result.data
+        return fetch_table(table_name, columns=columns)
     except Exception as e:
         st.error(f"读取{table_name}数据失败: {str(e)}")
         return []
 
-def get_unit_data(table_name, unit_name):
-    """获取单个单位的数据"""
+@st.cache_resource
+def get_fetch_pool():
+    """并行读取数据表的线程池（进程内共享）"""
+    return ThreadPoolExecutor(max_workers=8)
+
+def get_tables(table_names, columns="*", unit_name=None):
+    """并行读取多张表（可按单位过滤），返回 {表名: 数据}；各请求互不依赖，总耗时约等于最慢的一次"""
+    futures = {
+        table_name: get_fetch_pool().submit(fetch_table, table_name, unit_name, columns)
+        for table_name in table_names
+    }
+    tables = {}
+    for table_name, future in futures.items():
+        # 在主线程等待结果并提示错误（工作线程中不能调用st.*）
+        try:
+            tables[table_name] = future.result()
+        except Exception as e:
+            st.error(f"读取{table_name}数据失败: {str(e)}")
+            tables[table_name] = []
+    return tables
+
+def get_page(table_name, page):
+    """获取一页数据"""
     try:
-        result = supabase.table(table_name).select("*").eq("unit_name", unit_name).execute()
-        return result.data
+        return fetch_page(table_name, page)
     except Exception as e:
-        st.error(f"读取数据失败: {str(e)}")
-        return []
+        st.error(f"读取{table_name}数据失败: {str(e)}")
+        return [], 0
+
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_summary_documents(unit_name=None):
+    """查询年度总结文档，按单位、上传时间倒序排列（缓存60秒）"""
+    query = supabase.table("summary_documents").select("*")
+    if unit_name:
+        query = query.eq("unit_name", unit_name)
+    return query.order("unit_name").order("uploaded_at", desc=True).execute().data
 
-def get_summary_documents(unit_name):
-    """获取单位的所有年度总结文档"""
+def get_summary_documents(unit_name=None):
+    """获取单位的所有年度总结文档（不指定单位时返回全部）"""
     try:
-        result = supabase.table("summary_documents").select("*").eq("unit_name", unit_name).order("uploaded_at", desc=True).execute()
-        return result.data
+        return fetch_summary_documents(unit_name)
     except Exception as e:
         st.error(f"读取文档列表失败: {str(e)}")
         return []
 
+# 概览和导出统计只用到work_summary的联系信息，不读取总结正文
+WORK_SUMMARY_COLUMNS = "unit_name,updated_at,contact_person,contact_phone"
+
+# ==================== 表格构建 ====================
+# 字段 → 中文表头
+PROJECT_COLUMNS = {
+    'project_leader': '项目负责人',
+    'project_name': '项目名称',
+    'project_unit': '立项单位',
+    'fund_name': '基金名称',
+    'fund_number': '编号',
+    'fund_amount': '资助金额（万元）',
+    'project_date': '立项时间'
+}
+
+PUBLICATION_COLUMNS = {
+    'publication_type': '类型',
+    'title': '题目',
+    'journal': '刊物名称',
+    'author': '作者',
+    'level': '刊物等级',
+    'publication_date': '发表时间'
+}
+
+def count_by_unit(records):
+    """按单位统计记录数（一次遍历，返回以单位名称为索引的Series）"""
+    return pd.Series([record['unit_name'] for record in records], dtype=object).value_counts()
+
+# 提交情况统计的计数列：数据表 → 列名（概览表与导出统计表共用）
+SUBMIT_COUNT_COLUMNS = {
+    'summary_documents': '年度总结',
+    'academic_activities': '学术活动',
+    'popular_activities': '科普活动',
+    'competitions': '技能竞赛',
+    'awards': '获奖情况',
+    'research_projects': '科研立项',
+    'publications': '论文发表'
+}
+
+def count_submissions(tables, all_units):
+    """统计各单位在每张表中的记录数，返回以单位名称为索引的DataFrame（未提交计为0）"""
+    return pd.concat(
+        [count_by_unit(tables[table_name]).rename(column) for table_name, column in SUBMIT_COUNT_COLUMNS.items()],
+        axis=1
+    ).reindex(all_units).fillna(0).astype(int)
+
+def records_to_frame(records, columns):
+    """按列构建DataFrame，避免逐行构造字典"""
+    df = pd.DataFrame({header: [record[field] for record in records] for field, header in columns.items()})
+    # 少数单位对应大量记录，category按字典编码，减少内存和传给前端的Arrow数据量
+    if '单位名称' in df:
+        df['单位名称'] = df['单位名称'].astype('category')
+    return df
+
+# ==================== 图片展示 ====================
+def render_images(image_urls, key):
+    """懒加载展示图片（每行3张），点击查看原图"""
+    # 默认只显示图片数量，勾选后才生成图片，避免折叠区域内的图片随页面一起渲染
+    if not st.checkbox(f"🖼️ 显示图片（{len(image_urls)}张）", key=key):
+        return
+    # 整组图片输出为一个HTML网格，不再逐张创建列和元素；
+    # 浏览器原生 loading="lazy"：屏幕外的图片不会提前下载
+    cells = ''.join(
+        f'<a href="{safe_url}" target="_blank">'
+        f'<img src="{safe_url}" loading="lazy" decoding="async" style="width:100%">'
+        f'</a>'
+        for safe_url in (html.escape(img_url, quote=True) for img_url in image_urls)
+    )
+    st.markdown(
+        f'<div style="display:grid;grid-template-columns:repeat(3,1fr);gap:8px">{cells}</div>',
+        unsafe_allow_html=True
+    )
+
+# 带图片的记录：数据表 → (名称字段, 日期字段, [(字段, 显示标签)])
+RECORD_FIELDS = {
+    'academic_activities': ('activity_name', 'activity_date', [('activity_date', '活动日期'), ('activity_name', '活动名称'), ('description', '活动简介')]),
+    'popular_activities': ('activity_name', 'activity_date', [('activity_date', '活动日期'), ('activity_name', '活动名称'), ('description', '活动简介')]),
+    'competitions': ('competition_name', 'competition_date', [('competition_date', '竞赛日期'), ('competition_name', '竞赛名称'), ('description', '竞赛简介')]),
+    'awards': ('award_name', 'award_date', [('award_date', '获奖日期'), ('award_name', '奖项名称'), ('award_organization', '颁奖单位')])
+}
+
+def render_record(table_name, item, prefix):
+    """以折叠区域展示一条活动/竞赛/获奖记录，标题为 前缀+名称(日期)"""
+    name_field, date_field, fields = RECORD_FIELDS[table_name]
+    with st.expander(f"{prefix}{item[name_field]} ({item[date_field]})"):
+        for field, label in fields:
+            st.write(f"**{label}：** {item[field]}")
+        
+        image_urls = item.get('image_urls', [])
+        if image_urls:
+            render_images(image_urls, key=f"img_{table_name}_{item['id']}")
+
+# ==================== 导出函数 ====================
+# 分段导出可选的每表最大行数（Excel单表上限为1048576行）
+SHEET_SIZE_OPTIONS = [100_000, 250_000, 500_000, 1_000_000]
+
+def write_sheet(workbook, sheet_name, headers, rows, total, max_rows=SHEET_SIZE_OPTIONS[-1]):
+    """逐行写入xlsxwriter工作表，跳过DataFrame中间层；超过max_rows时拆分为 名称_1、名称_2…"""
+    rows = iter(rows)
+    parts = max(1, -(-total // max_rows))
+    for part in range(1, parts + 1):
+        worksheet = workbook.add_worksheet(sheet_name if parts == 1 else f"{sheet_name}_{part}")
+        worksheet.write_row(0, 0, headers)
+        for row_idx, row in enumerate(itertools.islice(rows, max_rows), 1):
+            worksheet.write_row(row_idx, 0, row)
+
+def join_image_urls(record):
+    """多张图片链接换行拼接，无图片时为“无”"""
+    return '\n'.join(record['image_urls']) or '无'
+
+# (工作表名, 数据表, 表头, 行构建函数)，Excel与CSV导出共用
+EXPORT_SHEETS = [
+    (
+        '年度总结文档', 'summary_documents',
+        ['单位名称', '原文件名', '上传时间', '文档链接'],
+        lambda doc: (
+            doc['unit_name'],
+            doc.get('original_filename', '未知'),
+            doc.get('uploaded_at', '未知')[:19],
+            doc['document_url']
+        )
+    ),
+    (
+        '科研立项', 'research_projects',
+        ['单位名称', '项目负责人', '项目名称', '立项单位', '基金名称', '编号', '资助金额（万元）', '立项时间'],
+        lambda proj: (
+            proj['unit_name'],
+            proj['project_leader'],
+            proj['project_name'],
+            proj['project_unit'],
+            proj['fund_name'],
+            proj['fund_number'],
+            proj['fund_amount'],
+            proj['project_date']
+        )
+    ),
+    (
+        '论文发表', 'publications',
+        ['单位名称', '类型', '题目', '刊物名称', 'CN号/出版社', '主管部门', '卷期', '页码', '作者', '刊物等级', '发表时间'],
+        lambda pub: (
+            pub['unit_name'],
+            pub['publication_type'],
+            pub['title'],
+            pub['journal'],
+            pub.get('cn_number', ''),
+            pub.get('department', ''),
+            pub.get('issue', ''),
+            pub.get('pages', ''),
+            pub['author'],
+            pub['level'],
+            pub['publication_date']
+        )
+    ),
+    (
+        '学术活动', 'academic_activities',
+        ['单位名称', '日期', '活动名称', '活动简介', '图片链接'],
+        lambda act: (act['unit_name'], act['activity_date'], act['activity_name'], act['description'], join_image_urls(act))
+    ),
+    (
+        '科普活动', 'popular_activities',
+        ['单位名称', '日期', '活动名称', '活动简介', '图片链接'],
+        lambda act: (act['unit_name'], act['activity_date'], act['activity_name'], act['description'], join_image_urls(act))
+    ),
+    (
+        '技能竞赛', 'competitions',
+        ['单位名称', '日期', '竞赛名称', '竞赛简介', '图片链接'],
+        lambda comp: (comp['unit_name'], comp['competition_date'], comp['competition_name'], comp['description'], join_image_urls(comp))
+    ),
+    (
+        '获奖情况', 'awards',
+        ['单位名称', '日期', '奖项名称', '颁奖单位', '图片链接'],
+        lambda award: (
+            award['unit_name'],
+            award['award_date'],
+            award['award_name'],
+            award['award_organization'],
+            join_image_urls(award)
+        )
+    )
+]
+
+def build_csv(headers, rows):
+    """生成CSV字节（utf-8-sig，Excel可直接打开），逐行写出不构建DataFrame"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(headers)
+    writer.writerows(rows)
+    return buffer.getvalue().encode('utf-8-sig')
+
+def iter_submit_rows(export_data, work_summary, all_units):
+    """逐个单位生成提交情况统计行（计数与概览表共用count_submissions）"""
+    counts = count_submissions(export_data, all_units)
+    unit_summary = {item['unit_name']: item for item in work_summary}
+    
+    for unit, *unit_counts in counts.itertuples(name=None):
+        # 获取联系信息
+        unit_info = unit_summary.get(unit, {})
+        
+        yield (
+            unit,
+            unit_info.get('contact_person', '未填写'),
+            unit_info.get('contact_phone', '未填写'),
+            *unit_counts
+        )
+
+def export_fingerprint(export_data, work_summary, all_units, sheet_size):
+    """导出数据指纹：各表记录只增删不修改，(行数, 最大id)即可反映变化；联系信息会被修改，直接纳入"""
+    return (
+        sheet_size,
+        tuple(all_units),
+        tuple(
+            (table_name, len(rows), max((row['id'] for row in rows), default=0))
+            for table_name, rows in export_data.items()
+        ),
+        tuple((item['unit_name'], item.get('contact_person'), item.get('contact_phone')) for item in work_summary)
+    )
+
+@st.cache_resource
+def get_export_pool():
+    """后台生成Excel的线程池（进程内共享）"""
+    return ThreadPoolExecutor(max_workers=2)
+
+def build_export_workbook(export_data, work_summary, all_units, sheet_size):
+    """生成完整Excel汇总表，返回文件字节（在后台线程运行，不能调用st.*）"""
+    output = io.BytesIO()
+    # constant_memory逐行落盘，要求所有工作表按行顺序写入（不能使用to_excel）
+    # strings_to_urls关闭后图片链接按纯文本写入，避免多行链接被转成超链接
+    with pd.ExcelWriter(
+        output,
+        engine='xlsxwriter',
+        engine_kwargs={'options': {'constant_memory': True, 'strings_to_urls': False}}
+    ) as writer:
+        for sheet_name, table_name, headers, to_row in EXPORT_SHEETS:
+            rows = export_data[table_name]
+            if rows:
+                write_sheet(writer.book, sheet_name, headers, map(to_row, rows), len(rows), sheet_size)
+        
+        write_sheet(
+            writer.book,
+            '提交情况统计',
+            ['单位名称', '联系人', '联系电话', '年度总结版本数', '学术活动', '科普活动', '技能竞赛', '获奖情况', '科研立项', '论文发表'],
+            iter_submit_rows(export_data, work_summary, all_units),
+            len(all_units),
+            sheet_size
+        )
+    return output.getvalue()
+
+@st.fragment
+def excel_export_panel(all_units):
+    """Excel完整汇总导出（片段内交互只重跑本片段，不重跑整个页面）"""
+    sheet_size = st.selectbox(
+        "段大小（每个工作表最多行数）",
+        SHEET_SIZE_OPTIONS,
+        index=len(SHEET_SIZE_OPTIONS) - 1,
+        format_func=lambda n: f"{n:,}行",
+        help="数据量超过段大小时，自动拆分为多个工作表（如 获奖情况_1、获奖情况_2）"
+    )
+    
+    if st.button("📊 生成完整Excel汇总表（含图片链接）", type="primary"):
+        # 在主线程读取数据（读取失败需要st.error提示），工作簿在后台线程生成
+        export_data = get_tables([table_name for _, table_name, _, _ in EXPORT_SHEETS])
+        work_summary = get_all_data("work_summary", WORK_SUMMARY_COLUMNS)
+        # 数据与段大小未变化时直接复用上次生成的文件
+        fingerprint = export_fingerprint(export_data, work_summary, all_units, sheet_size)
+        if "export_future" not in st.session_state or st.session_state.get("export_fingerprint") != fingerprint:
+            st.session_state["export_future"] = get_export_pool().submit(
+                build_export_workbook, export_data, work_summary, all_units, sheet_size
+            )
+            st.session_state["export_fingerprint"] = fingerprint
+    
+    export_future = st.session_state.get("export_future")
+    if export_future is not None:
+        if not export_future.done():
+            st.info("⏳ Excel文件正在后台生成，可继续浏览其他页面，稍后回到此页下载")
+            # 点击按钮只重跑本片段，刷新生成状态
+            st.button("🔄 查看生成进度")
+        elif export_future.exception() is not None:
+            st.error(f"生成Excel时出错：{str(export_future.exception())}")
+            del st.session_state["export_future"]
+        else:
+            st.download_button(
+                label="📥 下载Excel汇总表",
+                data=export_future.result(),
+                file_name=f"揭阳市临床药学分会_数据汇总_{datetime.now().strftime('%Y%m%d')}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
+            st.success("✅ Excel文件生成成功！包含年度总结文档、图片链接和颁奖单位信息")
+
 # ==================== 主程序 ====================
 def main():
     # 验证密码
@@ -89,24 +448,32 @@ def main():
     
     st.title("📊 揭阳市临床药学分会数据管理后台")
     
+    # 图片由浏览器直接从Supabase Storage加载，提前建立连接，所有图片共用一次TLS握手
+    st.markdown(f'<link rel="preconnect" href="{html.escape(SUPABASE_URL, quote=True)}">', unsafe_allow_html=True)
+    
     # 添加登出按钮
     if st.sidebar.button("🚪 退出登录"):
         st.session_state["password_correct"] = False
         st.rerun()
     
+    # 数据缓存60秒，需要查看最新提交时手动刷新
+    if st.sidebar.button("🔄 刷新数据"):
+        st.cache_data.clear()
+        st.rerun()
+    
     st.markdown("---")
     
     # 获取所有单位列表
-    work_summary_data = get_all_data("work_summary")
-    all_units = list(set([item['unit_name'] for item in work_summary_data]))
+    work_summary_data = get_all_data("work_summary", WORK_SUMMARY_COLUMNS)
+    all_units = sorted({item['unit_name'] for item in work_summary_data})
     
     # 如果没有数据，尝试从其他表获取单位列表
     if not all_units:
-        for table in ["academic_activities", "popular_activities", "competitions", "awards", "research_projects", "publications", "summary_documents"]:
-            data = get_all_data(table)
-            if data:
-                all_units.extend([item['unit_name'] for item in data])
-        all_units = list(set(all_units))
+        fallback_data = get_tables(
+            ["academic_activities", "popular_activities", "competitions", "awards", "research_projects", "publications", "summary_documents"],
+            "unit_name"
+        )
+        all_units = sorted({item['unit_name'] for rows in fallback_data.values() for item in rows})
     
     if not all_units:
         st.warning("⚠️ 暂无数据，请等待各单位提交")
@@ -126,10 +493,15 @@ def main():
         # 统计信息
         col1, col2, col3, col4 = st.columns(4)
         
-        academic_data = get_all_data("academic_activities")
-        popular_data = get_all_data("popular_activities")
-        comp_data = get_all_data("competitions")
-        award_data = get_all_data("awards")
+        # 一次性并行读取统计所需的各表（含年度总结文档，不再逐个单位请求）
+        overview_data = get_tables(
+            ["academic_activities", "popular_activities", "competitions", "awards", "research_projects", "publications", "summary_documents"],
+            "unit_name"
+        )
+        academic_data = overview_data["academic_activities"]
+        popular_data = overview_data["popular_activities"]
+        comp_data = overview_data["competitions"]
+        award_data = overview_data["awards"]
         
         with col1:
             st.metric("提交单位数", len(all_units))
@@ -142,8 +514,8 @@ def main():
         
         col1, col2, col3 = st.columns(3)
         
-        project_data = get_all_data("research_projects")
-        pub_data = get_all_data("publications")
+        project_data = overview_data["research_projects"]
+        pub_data = overview_data["publications"]
         
         with col1:
             st.metric("获奖总数", len(award_data))
@@ -156,45 +528,23 @@ def main():
         
         # 提交情况表
         st.subheader("各单位提交情况")
-        submit_data = []
+        df_submit = count_submissions(overview_data, all_units)
+        df_submit['年度总结'] = df_submit['年度总结'].map(lambda n: f'{n}个版本' if n > 0 else '✗')
         
-        for unit in all_units:
-            # 获取该单位的年度总结文档数量
-            summary_docs = get_summary_documents(unit)
-            summary_count = len(summary_docs)
-            
-            row = {
-                '单位名称': unit,
-                '年度总结': f'{summary_count}个版本' if summary_count > 0 else '✗',
-                '学术活动': len([item for item in academic_data if item['unit_name'] == unit]),
-                '科普活动': len([item for item in popular_data if item['unit_name'] == unit]),
-                '技能竞赛': len([item for item in comp_data if item['unit_name'] == unit]),
-                '获奖情况': len([item for item in award_data if item['unit_name'] == unit]),
-                '科研立项': len([item for item in project_data if item['unit_name'] == unit]),
-                '论文发表': len([item for item in pub_data if item['unit_name'] == unit])
-            }
-            
-            # 获取最后更新时间
-            unit_summary = [item for item in work_summary_data if item['unit_name'] == unit]
-            if unit_summary:
-                row['最后更新'] = unit_summary[0].get('updated_at', '未知')[:19]
-                row['联系人'] = unit_summary[0].get('contact_person', '未填写')
-                row['联系电话'] = unit_summary[0].get('contact_phone', '未填写')
-            else:
-                row['最后更新'] = '未提交'
-                row['联系人'] = '未填写'
-                row['联系电话'] = '未填写'
-            
-            submit_data.append(row)
+        # 获取最后更新时间和联系信息
+        unit_summary = {item['unit_name']: item for item in work_summary_data}
+        df_submit['最后更新'] = [unit_summary[unit].get('updated_at', '未知')[:19] if unit in unit_summary else '未提交' for unit in all_units]
+        df_submit['联系人'] = [unit_summary[unit].get('contact_person', '未填写') if unit in unit_summary else '未填写' for unit in all_units]
+        df_submit['联系电话'] = [unit_summary[unit].get('contact_phone', '未填写') if unit in unit_summary else '未填写' for unit in all_units]
         
-        df_submit = pd.DataFrame(submit_data)
+        df_submit = df_submit.rename_axis('单位名称').reset_index()
         st.dataframe(df_submit, use_container_width=True, hide_index=True)
     
     # ========== 按单位查看 ==========
     elif view_mode == "🏥 按单位查看":
         st.header("🏥 按单位查看数据")
         
-        selected_unit = st.selectbox("选择单位", sorted(all_units))
+        selected_unit = st.selectbox("选择单位", all_units)
         
         if selected_unit:
             tabs = st.tabs([
@@ -207,9 +557,15 @@ def main():
                 "📚 论文发表"
             ])
             
+            # 各标签页的数据一次并行读取
+            unit_data = get_tables(
+                ["work_summary", "academic_activities", "popular_activities", "competitions", "awards", "research_projects", "publications"],
+                unit_name=selected_unit
+            )
+            
             # 年度总结
             with tabs[0]:
-                summary_data = get_unit_data("work_summary", selected_unit)
+                summary_data = unit_data["work_summary"]
                 if summary_data:
                     info = summary_data[0]
                     st.write(f"**联系人：** {info.get('contact_person', '未填写')}")
@@ -237,139 +593,38 @@ def main():
                 else:
                     st.info("该单位尚未提交年度总结与计划")
             
-            # 学术活动
-            with tabs[1]:
-                academic = get_unit_data("academic_activities", selected_unit)
-                if academic:
-                    st.success(f"✅ 共 {len(academic)} 条学术活动记录")
-                    for idx, act in enumerate(academic, 1):
-                        with st.expander(f"{idx}. {act['activity_name']} ({act['activity_date']})"):
-                            st.write(f"**活动日期：** {act['activity_date']}")
-                            st.write(f"**活动名称：** {act['activity_name']}")
-                            st.write(f"**活动简介：** {act['description']}")
-                            
-                            image_urls = json.loads(act.get('image_urls', '[]'))
-                            if image_urls:
-                                st.write(f"**活动图片：** {len(image_urls)}张")
-                                cols = st.columns(min(len(image_urls), 3))
-                                for img_idx, img_url in enumerate(image_urls):
-                                    with cols[img_idx % 3]:
-                                        try:
-                                            st.image(img_url, use_container_width=True)
-                                        except:
-                                            st.markdown(f"[🖼️ 查看图片]({img_url})")
-                else:
-                    st.info("该单位尚未提交学术活动")
-            
-            # 科普活动
-            with tabs[2]:
-                popular = get_unit_data("popular_activities", selected_unit)
-                if popular:
-                    st.success(f"✅ 共 {len(popular)} 条科普活动记录")
-                    for idx, act in enumerate(popular, 1):
-                        with st.expander(f"{idx}. {act['activity_name']} ({act['activity_date']})"):
-                            st.write(f"**活动日期：** {act['activity_date']}")
-                            st.write(f"**活动名称：** {act['activity_name']}")
-                            st.write(f"**活动简介：** {act['description']}")
-                            
-                            image_urls = json.loads(act.get('image_urls', '[]'))
-                            if image_urls:
-                                st.write(f"**活动图片：** {len(image_urls)}张")
-                                cols = st.columns(min(len(image_urls), 3))
-                                for img_idx, img_url in enumerate(image_urls):
-                                    with cols[img_idx % 3]:
-                                        try:
-                                            st.image(img_url, use_container_width=True)
-                                        except:
-                                            st.markdown(f"[🖼️ 查看图片]({img_url})")
-                else:
-                    st.info("该单位尚未提交科普活动")
-            
-            # 技能竞赛
-            with tabs[3]:
-                comps = get_unit_data("competitions", selected_unit)
-                if comps:
-                    st.success(f"✅ 共 {len(comps)} 条技能竞赛记录")
-                    for idx, comp in enumerate(comps, 1):
-                        with st.expander(f"{idx}. {comp['competition_name']} ({comp['competition_date']})"):
-                            st.write(f"**竞赛日期：** {comp['competition_date']}")
-                            st.write(f"**竞赛名称：** {comp['competition_name']}")
-                            st.write(f"**竞赛简介：** {comp['description']}")
-                            
-                            image_urls = json.loads(comp.get('image_urls', '[]'))
-                            if image_urls:
-                                st.write(f"**竞赛图片：** {len(image_urls)}张")
-                                cols = st.columns(min(len(image_urls), 3))
-                                for img_idx, img_url in enumerate(image_urls):
-                                    with cols[img_idx % 3]:
-                                        try:
-                                            st.image(img_url, use_container_width=True)
-                                        except:
-                                            st.markdown(f"[🖼️ 查看图片]({img_url})")
-                else:
-                    st.info("该单位尚未提交技能竞赛")
-            
-            # 获奖情况
-            with tabs[4]:
-                awards = get_unit_data("awards", selected_unit)
-                if awards:
-                    st.success(f"✅ 共 {len(awards)} 条获奖记录")
-                    for idx, award in enumerate(awards, 1):
-                        with st.expander(f"{idx}. {award['award_name']} ({award['award_date']})"):
-                            st.write(f"**获奖日期：** {award['award_date']}")
-                            st.write(f"**奖项名称：** {award['award_name']}")
-                            st.write(f"**颁奖单位：** {award.get('award_organization', '未填写')}")
-                            
-                            image_urls = json.loads(award.get('image_urls', '[]'))
-                            if image_urls:
-                                st.write(f"**获奖图片：** {len(image_urls)}张")
-                                cols = st.columns(min(len(image_urls), 3))
-                                for img_idx, img_url in enumerate(image_urls):
-                                    with cols[img_idx % 3]:
-                                        try:
-                                            st.image(img_url, use_container_width=True)
-                                        except:
-                                            st.markdown(f"[🖼️ 查看图片]({img_url})")
-                else:
-                    st.info("该单位尚未提交获奖情况")
+            # 学术活动、科普活动、技能竞赛、获奖情况
+            for tab, (table_name, record_label, category_label) in zip(tabs[1:5], [
+                ("academic_activities", "学术活动", "学术活动"),
+                ("popular_activities", "科普活动", "科普活动"),
+                ("competitions", "技能竞赛", "技能竞赛"),
+                ("awards", "获奖", "获奖情况")
+            ]):
+                with tab:
+                    records = unit_data[table_name]
+                    if records:
+                        st.success(f"✅ 共 {len(records)} 条{record_label}记录")
+                        for idx, item in enumerate(records, 1):
+                            render_record(table_name, item, f"{idx}. ")
+                    else:
+                        st.info(f"该单位尚未提交{category_label}")
             
             # 科研立项
             with tabs[5]:
-                projects = get_unit_data("research_projects", selected_unit)
+                projects = unit_data["research_projects"]
                 if projects:
                     st.success(f"✅ 共 {len(projects)} 条科研立项记录")
-                    df_data = []
-                    for proj in projects:
-                        df_data.append({
-                            '项目负责人': proj['project_leader'],
-                            '项目名称': proj['project_name'],
-                            '立项单位': proj['project_unit'],
-                            '基金名称': proj['fund_name'],
-                            '编号': proj['fund_number'],
-                            '资助金额（万元）': proj['fund_amount'],
-                            '立项时间': proj['project_date']
-                        })
-                    df = pd.DataFrame(df_data)
+                    df = records_to_frame(projects, PROJECT_COLUMNS)
                     st.dataframe(df, use_container_width=True, hide_index=True)
                 else:
                     st.info("该单位尚未提交科研立项")
             
             # 论文发表
             with tabs[6]:
-                pubs = get_unit_data("publications", selected_unit)
+                pubs = unit_data["publications"]
                 if pubs:
                     st.success(f"✅ 共 {len(pubs)} 条论文发表记录")
-                    df_data = []
-                    for pub in pubs:
-                        df_data.append({
-                            '类型': pub['publication_type'],
-                            '题目': pub['title'],
-                            '刊物名称': pub['journal'],
-                            '作者': pub['author'],
-                            '刊物等级': pub['level'],
-                            '发表时间': pub['publication_date']
-                        })
-                    df = pd.DataFrame(df_data)
+                    df = records_to_frame(pubs, PUBLICATION_COLUMNS)
                     st.dataframe(df, use_container_width=True, hide_index=True)
                 else:
                     st.info("该单位尚未提交论文发表")
@@ -386,17 +641,19 @@ def main():
         if category == "📄 年度总结文档":
             st.subheader("各单位年度总结文档汇总")
             
-            all_docs = get_all_data("summary_documents")
+            # 数据库已按单位、上传时间倒序排好，顺序遍历分组即可
+            all_docs = get_summary_documents()
             
             if all_docs:
                 # 按单位分组显示
-                units_with_docs = list(set([doc['unit_name'] for doc in all_docs]))
+                unit_count = 0
                 
-                for unit in sorted(units_with_docs):
-                    unit_docs = [doc for doc in all_docs if doc['unit_name'] == unit]
+                for unit, unit_docs in itertools.groupby(all_docs, key=itemgetter('unit_name')):
+                    unit_docs = list(unit_docs)
+                    unit_count += 1
                     
                     with st.expander(f"🏥 {unit} - {len(unit_docs)}个版本", expanded=False):
-                        for idx, doc in enumerate(sorted(unit_docs, key=lambda x: x['uploaded_at'], reverse=True), 1):
+                        for idx, doc in enumerate(unit_docs, 1):
                             col1, col2 = st.columns([7, 3])
                             
                             with col1:
@@ -411,26 +668,14 @@ def main():
                             
                             st.markdown("---")
                 
-                st.info(f"共 {len(units_with_docs)} 个单位提交了年度总结，总计 {len(all_docs)} 个文档版本")
+                st.info(f"共 {unit_count} 个单位提交了年度总结，总计 {len(all_docs)} 个文档版本")
             else:
                 st.info("暂无年度总结文档")
         
         elif category == "🔬 科研立项":
             projects = get_all_data("research_projects")
             if projects:
-                df_data = []
-                for proj in projects:
-                    df_data.append({
-                        '单位名称': proj['unit_name'],
-                        '项目负责人': proj['project_leader'],
-                        '项目名称': proj['project_name'],
-                        '立项单位': proj['project_unit'],
-                        '基金名称': proj['fund_name'],
-                        '编号': proj['fund_number'],
-                        '资助金额（万元）': proj['fund_amount'],
-                        '立项时间': proj['project_date']
-                    })
-                df = pd.DataFrame(df_data)
+                df = records_to_frame(projects, {'unit_name': '单位名称', **PROJECT_COLUMNS})
                 st.dataframe(df, use_container_width=True, hide_index=True)
                 st.info(f"共 {len(projects)} 条记录")
             else:
@@ -439,18 +684,7 @@ def main():
         elif category == "📚 论文发表":
             pubs = get_all_data("publications")
             if pubs:
-                df_data = []
-                for pub in pubs:
-                    df_data.append({
-                        '单位名称': pub['unit_name'],
-                        '类型': pub['publication_type'],
-                        '题目': pub['title'],
-                        '刊物名称': pub['journal'],
-                        '作者': pub['author'],
-                        '刊物等级': pub['level'],
-                        '发表时间': pub['publication_date']
-                    })
-                df = pd.DataFrame(df_data)
+                df = records_to_frame(pubs, {'unit_name': '单位名称', **PUBLICATION_COLUMNS})
                 st.dataframe(df, use_container_width=True, hide_index=True)
                 st.info(f"共 {len(pubs)} 条记录")
             else:
@@ -464,68 +698,16 @@ def main():
                 "🥇 获奖情况": "awards"
             }
             
-            data = get_all_data(table_map[category])
+            # 分页读取，每次只查询和渲染一页记录
+            page = st.number_input("页码", min_value=1, value=1, step=1, key=f"page_{table_map[category]}")
+            data, total = get_page(table_map[category], page)
             if data:
-                for idx, item in enumerate(data, 1):
-                    unit = item['unit_name']
-                    
-                    if category == "🥇 获奖情况":
-                        title = f"{idx}. {unit} - {item['award_name']} ({item['award_date']})"
-                        with st.expander(title):
-                            st.write(f"**获奖日期：** {item['award_date']}")
-                            st.write(f"**奖项名称：** {item['award_name']}")
-                            st.write(f"**颁奖单位：** {item.get('award_organization', '未填写')}")
-                            
-                            image_urls = json.loads(item.get('image_urls', '[]'))
-                            if image_urls:
-                                st.write(f"**图片：** {len(image_urls)}张")
-                                cols = st.columns(min(len(image_urls), 3))
-                                for img_idx, img_url in enumerate(image_urls):
-                                    with cols[img_idx % 3]:
-                                        try:
-                                            st.image(img_url, use_container_width=True)
-                                        except:
-                                            st.markdown(f"[🖼️ 查看图片]({img_url})")
-                    
-                    elif category == "🏆 技能竞赛":
-                        title = f"{idx}. {unit} - {item['competition_name']} ({item['competition_date']})"
-                        description = item['description']
-                        with st.expander(title):
-                            st.write(f"**竞赛日期：** {item['competition_date']}")
-                            st.write(f"**竞赛名称：** {item['competition_name']}")
-                            st.write(f"**竞赛简介：** {description}")
-                            
-                            image_urls = json.loads(item.get('image_urls', '[]'))
-                            if image_urls:
-                                st.write(f"**图片：** {len(image_urls)}张")
-                                cols = st.columns(min(len(image_urls), 3))
-                                for img_idx, img_url in enumerate(image_urls):
-                                    with cols[img_idx % 3]:
-                                        try:
-                                            st.image(img_url, use_container_width=True)
-                                        except:
-                                            st.markdown(f"[🖼️ 查看图片]({img_url})")
-                    
-                    else:
-                        title = f"{idx}. {unit} - {item['activity_name']} ({item['activity_date']})"
-                        description = item['description']
-                        with st.expander(title):
-                            st.write(f"**活动日期：** {item['activity_date']}")
-                            st.write(f"**活动名称：** {item['activity_name']}")
-                            st.write(f"**活动简介：** {description}")
-                            
-                            image_urls = json.loads(item.get('image_urls', '[]'))
-                            if image_urls:
-                                st.write(f"**图片：** {len(image_urls)}张")
-                                cols = st.columns(min(len(image_urls), 3))
-                                for img_idx, img_url in enumerate(image_urls):
-                                    with cols[img_idx % 3]:
-                                        try:
-                                            st.image(img_url, use_container_width=True)
-                                        except:
-                                            st.markdown(f"[🖼️ 查看图片]({img_url})")
+                for idx, item in enumerate(data, (page - 1) * PAGE_SIZE + 1):
+                    render_record(table_map[category], item, f"{idx}. {item['unit_name']} - ")
                 
-                st.info(f"共 {len(data)} 条记录")
+                st.info(f"第 {page}/{-(-total // PAGE_SIZE)} 页，共 {total} 条记录")
+            elif total:
+                st.info(f"页码超出范围，共 {-(-total // PAGE_SIZE)} 页")
             else:
                 st.info("暂无数据")
     
@@ -533,161 +715,27 @@ def main():
     elif view_mode == "📥 数据导出":
         st.header("📥 数据导出")
         
+        # CSV快速导出：单表，无需生成完整工作簿
+        st.subheader("⚡ 快速导出（CSV）")
+        sheet_names = [sheet[0] for sheet in EXPORT_SHEETS]
+        csv_sheet = st.selectbox("选择数据表", sheet_names)
+        sheet_name, table_name, headers, to_row = EXPORT_SHEETS[sheet_names.index(csv_sheet)]
+        rows = get_all_data(table_name)
+        if rows:
+            st.download_button(
+                label=f"📥 下载{sheet_name}（CSV）",
+                data=build_csv(headers, map(to_row, rows)),
+                file_name=f"揭阳市临床药学分会_{sheet_name}_{datetime.now().strftime('%Y%m%d')}.csv",
+                mime="text/csv"
+            )
+        else:
+            st.info("暂无数据")
+        
+        st.markdown("---")
+        st.subheader("📊 Excel格式（完整汇总）")
         st.info("💡 导出的Excel将包含所有数据和图片链接，包括多版本的年度总结文档信息")
         
-        if st.button("📊 生成完整Excel汇总表（含图片链接）", type="primary"):
-            with st.spinner("正在生成Excel文件..."):
-                try:
-                    output = io.BytesIO()
-                    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                        
-                        # 年度总结文档（新增）
-                        all_summary_docs = get_all_data("summary_documents")
-                        if all_summary_docs:
-                            df_data = []
-                            for doc in all_summary_docs:
-                                df_data.append({
-                                    '单位名称': doc['unit_name'],
-                                    '原文件名': doc.get('original_filename', '未知'),
-                                    '上传时间': doc.get('uploaded_at', '未知')[:19],
-                                    '文档链接': doc['document_url']
-                                })
-                            pd.DataFrame(df_data).to_excel(writer, sheet_name='年度总结文档', index=False)
-                        
-                        # 科研立项
-                        projects = get_all_data("research_projects")
-                        if projects:
-                            df_data = []
-                            for proj in projects:
-                                df_data.append({
-                                    '单位名称': proj['unit_name'],
-                                    '项目负责人': proj['project_leader'],
-                                    '项目名称': proj['project_name'],
-                                    '立项单位': proj['project_unit'],
-                                    '基金名称': proj['fund_name'],
-                                    '编号': proj['fund_number'],
-                                    '资助金额（万元）': proj['fund_amount'],
-                                    '立项时间': proj['project_date']
-                                })
-                            pd.DataFrame(df_data).to_excel(writer, sheet_name='科研立项', index=False)
-                        
-                        # 论文发表
-                        pubs = get_all_data("publications")
-                        if pubs:
-                            df_data = []
-                            for pub in pubs:
-                                df_data.append({
-                                    '单位名称': pub['unit_name'],
-                                    '类型': pub['publication_type'],
-                                    '题目': pub['title'],
-                                    '刊物名称': pub['journal'],
-                                    'CN号/出版社': pub.get('cn_number', ''),
-                                    '主管部门': pub.get('department', ''),
-                                    '卷期': pub.get('issue', ''),
-                                    '页码': pub.get('pages', ''),
-                                    '作者': pub['author'],
-                                    '刊物等级': pub['level'],
-                                    '发表时间': pub['publication_date']
-                                })
-                            pd.DataFrame(df_data).to_excel(writer, sheet_name='论文发表', index=False)
-                        
-                        # 学术活动（带图片链接）
-                        academic = get_all_data("academic_activities")
-                        if academic:
-                            df_data = []
-                            for act in academic:
-                                image_urls = json.loads(act.get('image_urls', '[]'))
-                                df_data.append({
-                                    '单位名称': act['unit_name'],
-                                    '日期': act['activity_date'],
-                                    '活动名称': act['activity_name'],
-                                    '活动简介': act['description'],
-                                    '图片链接': '\n'.join(image_urls) if image_urls else '无'
-                                })
-                            pd.DataFrame(df_data).to_excel(writer, sheet_name='学术活动', index=False)
-                        
-                        # 科普活动（带图片链接）
-                        popular = get_all_data("popular_activities")
-                        if popular:
-                            df_data = []
-                            for act in popular:
-                                image_urls = json.loads(act.get('image_urls', '[]'))
-                                df_data.append({
-                                    '单位名称': act['unit_name'],
-                                    '日期': act['activity_date'],
-                                    '活动名称': act['activity_name'],
-                                    '活动简介': act['description'],
-                                    '图片链接': '\n'.join(image_urls) if image_urls else '无'
-                                })
-                            pd.DataFrame(df_data).to_excel(writer, sheet_name='科普活动', index=False)
-                        
-                        # 技能竞赛（带图片链接）
-                        comps = get_all_data("competitions")
-                        if comps:
-                            df_data = []
-                            for comp in comps:
-                                image_urls = json.loads(comp.get('image_urls', '[]'))
-                                df_data.append({
-                                    '单位名称': comp['unit_name'],
-                                    '日期': comp['competition_date'],
-                                    '竞赛名称': comp['competition_name'],
-                                    '竞赛简介': comp['description'],
-                                    '图片链接': '\n'.join(image_urls) if image_urls else '无'
-                                })
-                            pd.DataFrame(df_data).to_excel(writer, sheet_name='技能竞赛', index=False)
-                        
-                        # 获奖情况（带图片链接和颁奖单位）
-                        awards = get_all_data("awards")
-                        if awards:
-                            df_data = []
-                            for award in awards:
-                                image_urls = json.loads(award.get('image_urls', '[]'))
-                                df_data.append({
-                                    '单位名称': award['unit_name'],
-                                    '日期': award['award_date'],
-                                    '奖项名称': award['award_name'],
-                                    '颁奖单位': award.get('award_organization', '未填写'),
-                                    '图片链接': '\n'.join(image_urls) if image_urls else '无'
-                                })
-                            pd.DataFrame(df_data).to_excel(writer, sheet_name='获奖情况', index=False)
-                        
-                        # 提交情况统计
-                        work_summary = get_all_data("work_summary")
-                        submit_data = []
-                        for unit in all_units:
-                            # 统计年度总结文档版本数
-                            unit_summary_docs = [doc for doc in all_summary_docs if doc['unit_name'] == unit] if all_summary_docs else []
-                            summary_count = len(unit_summary_docs)
-                            
-                            # 获取联系信息
-                            unit_info = [item for item in work_summary if item['unit_name'] == unit]
-                            contact_person = unit_info[0].get('contact_person', '未填写') if unit_info else '未填写'
-                            contact_phone = unit_info[0].get('contact_phone', '未填写') if unit_info else '未填写'
-                            
-                            submit_data.append({
-                                '单位名称': unit,
-                                '联系人': contact_person,
-                                '联系电话': contact_phone,
-                                '年度总结版本数': summary_count,
-                                '学术活动': len([item for item in academic if item['unit_name'] == unit]) if academic else 0,
-                                '科普活动': len([item for item in popular if item['unit_name'] == unit]) if popular else 0,
-                                '技能竞赛': len([item for item in comps if item['unit_name'] == unit]) if comps else 0,
-                                '获奖情况': len([item for item in awards if item['unit_name'] == unit]) if awards else 0,
-                                '科研立项': len([item for item in projects if item['unit_name'] == unit]) if projects else 0,
-                                '论文发表': len([item for item in pubs if item['unit_name'] == unit]) if pubs else 0
-                            })
-                        pd.DataFrame(submit_data).to_excel(writer, sheet_name='提交情况统计', index=False)
-                    
-                    output.seek(0)
-                    st.download_button(
-                        label="📥 下载Excel汇总表",
-                        data=output,
-                        file_name=f"揭阳市临床药学分会_数据汇总_{datetime.now().strftime('%Y%m%d')}.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
-                    st.success("✅ Excel文件生成成功！包含年度总结文档、图片链接和颁奖单位信息")
-                except Exception as e:
-                    st.error(f"生成Excel时出错：{str(e)}")
+        excel_export_panel(all_units)
 
 if __name__ == "__main__":
     main()
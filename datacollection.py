@@ -3,10 +3,27 @@ import pandas as pd
 from datetime import datetime
 import json
 import base64
-from supabase import create_client, Client
+import io
+from supabase import create_client, Client, ClientOptions
+import httpx
+from PIL import Image, ImageOps
 import os
+import time
 import re
 import hashlib
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    import orjson
+    json_loads = orjson.loads
+    
+    def json_dumps(obj):
+        """orjson输出bytes，转为str写入text列"""
+        return orjson.dumps(obj).decode()
+except ImportError:
+    json_loads = json.loads
+    json_dumps = json.dumps
 
 # 设置页面配置
 st.set_page_config(
@@ -16,20 +33,41 @@ st.set_page_config(
 )
 
 # ==================== Supabase配置 ====================
+@st.cache_resource
+def get_client(url, key) -> Client:
+    """创建Supabase客户端（进程内共享，页面重跑时不再重复创建）"""
+    # 数据库与Storage共用一个长连接池，并发上传图片时复用连接、走HTTP/2多路复用
+    http_client = httpx.Client(
+        http2=True,
+        timeout=httpx.Timeout(120.0),
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=30)
+    )
+    return create_client(url, key, options=ClientOptions(httpx_client=http_client))
+
 try:
     SUPABASE_URL = st.secrets["SUPABASE_URL"]
     SUPABASE_KEY = st.secrets["SUPABASE_KEY"]
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    supabase: Client = get_client(SUPABASE_URL, SUPABASE_KEY)
 except Exception as e:
     st.error("⚠️ 数据库配置错误，请联系管理员")
     st.stop()
 
 # ==================== 文件名清理函数 ====================
 
+# 预编译的路径清理正则
+NON_WORD_RE = re.compile(r'[^\w]')
+NON_ASCII_RE = re.compile(r'[^\x00-\x7F]')
+NON_WORD_DASH_RE = re.compile(r'[^\w\-]')
+MULTI_UNDERSCORE_RE = re.compile(r'_+')
+
 def chinese_to_pinyin_simple(text):
     """简单的中文转拼音方法（使用哈希）"""
-    cleaned = re.sub(r'[^\w]', '', text)
-    ascii_part = re.sub(r'[^\x00-\x7F]', '', cleaned)
+    # 纯ASCII输入无需哈希，去掉非单词字符即可
+    if text.isascii():
+        return NON_WORD_RE.sub('', text) or "unit"
+    
+    cleaned = NON_WORD_RE.sub('', text)
+    ascii_part = NON_ASCII_RE.sub('', cleaned)
     
     if len(ascii_part) < len(cleaned):
         hash_obj = hashlib.md5(text.encode('utf-8'))
@@ -41,18 +79,20 @@ def chinese_to_pinyin_simple(text):
     else:
         return ascii_part if ascii_part else "unit"
 
+@lru_cache(maxsize=256)
 def sanitize_path(path_str):
     """清理路径字符串"""
     safe_str = chinese_to_pinyin_simple(path_str)
-    safe_str = re.sub(r'[^\w\-]', '_', safe_str)
-    safe_str = re.sub(r'_+', '_', safe_str)
+    safe_str = NON_WORD_DASH_RE.sub('_', safe_str)
+    safe_str = MULTI_UNDERSCORE_RE.sub('_', safe_str)
     safe_str = safe_str.strip('_')
     
     if len(safe_str) > 50:
         safe_str = safe_str[:50]
     
     if not safe_str:
-        safe_str = f"file_{datetime.now().strftime('%Y%m%d')}"
+        # 结果会被缓存，回退名不能依赖当前日期
+        safe_str = "file"
     
     return safe_str
 
@@ -62,6 +102,13 @@ def generate_safe_filename(original_name, prefix="file"):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:17]
     return f"{prefix}_{timestamp}{ext}"
 
+def generate_content_filename(file_bytes, original_name):
+    """按文件内容生成文件名（相同内容得到相同路径，重复上传不会产生新文件）"""
+    ext = os.path.splitext(original_name)[1]
+    digest = hashlib.blake2b(file_bytes, digest_size=16).hexdigest()
+    return f"{digest}{ext}"
+
+@lru_cache(maxsize=256)
 def get_unit_safe_name(unit_name):
     """为单位名称生成安全的文件夹名"""
     unit_hash = hashlib.md5(unit_name.encode('utf-8')).hexdigest()[:8]
@@ -75,14 +122,77 @@ def validate_phone(phone):
     phone = phone.replace(" ", "").replace("-", "")
     return len(phone) == 11 and phone.isdigit()
 
-def file_to_base64(file):
-    """将文件转换为base64字符串"""
+def bytes_to_base64(data):
+    """将字节数据转换为base64字符串"""
     try:
-        return base64.b64encode(file.getvalue()).decode('utf-8')
+        return base64.b64encode(data).decode('utf-8')
     except Exception as e:
         st.error(f"文件编码失败: {str(e)}")
         return None
 
+# 上传前压缩图片：最长边像素、JPEG质量；待提交列表预览用的缩略图最长边像素
+IMAGE_MAX_SIDE = 1920
+IMAGE_JPEG_QUALITY = 85
+IMAGE_THUMB_SIDE = 320
+
+def shrink_image(img_bytes, name, file_type):
+    """压缩图片为JPEG并限制尺寸，返回 (字节, 文件名, 类型)；带透明通道或压缩后不变小时原样返回"""
+    try:
+        with Image.open(io.BytesIO(img_bytes)) as im:
+            if "A" in im.getbands() or "transparency" in im.info:
+                return img_bytes, name, file_type
+            # 按EXIF方向摆正，避免手机照片转存后方向错误
+            im = ImageOps.exif_transpose(im)
+            im.thumbnail((IMAGE_MAX_SIDE, IMAGE_MAX_SIDE))
+            buf = io.BytesIO()
+            im.convert("RGB").save(buf, "JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+    except Exception:
+        return img_bytes, name, file_type
+    
+    data = buf.getvalue()
+    if len(data) >= len(img_bytes):
+        return img_bytes, name, file_type
+    return data, f"{os.path.splitext(name)[0]}.jpg", "image/jpeg"
+
+def make_thumbnail(img_bytes):
+    """生成待提交列表预览用的缩略图，失败时返回None"""
+    try:
+        with Image.open(io.BytesIO(img_bytes)) as im:
+            im = ImageOps.exif_transpose(im)
+            im.thumbnail((IMAGE_THUMB_SIDE, IMAGE_THUMB_SIDE))
+            buf = io.BytesIO()
+            if "A" in im.getbands() or "transparency" in im.info:
+                im.save(buf, "PNG")
+            else:
+                im.convert("RGB").save(buf, "JPEG", quality=70)
+        return buf.getvalue()
+    except Exception:
+        return None
+
+def images_to_data_list(images):
+    """将上传的图片编码为待提交记录中保存的 [{name, type, data(base64), thumb(base64)}] 列表"""
+    image_data_list = []
+    for img in images or []:
+        img_bytes, name, file_type = shrink_image(img.getvalue(), img.name, img.type)
+        b64_data = bytes_to_base64(img_bytes)
+        if b64_data:
+            thumb = make_thumbnail(img_bytes)
+            image_data_list.append({
+                'name': name,
+                'type': file_type,
+                'data': b64_data,
+                'thumb': bytes_to_base64(thumb) if thumb else None
+            })
+    return image_data_list
+
+def parse_image_urls(value):
+    """将image_urls字段解析为图片链接列表"""
+    # 列迁移为jsonb后PostgREST直接返回列表，无需再解析（写入端同时改为直接传列表）：
+    #   ALTER TABLE academic_activities ALTER COLUMN image_urls TYPE jsonb USING image_urls::jsonb;
+    if isinstance(value, list):
+        return value
+    return json_loads(value or '[]')
+
 def base64_to_bytes(b64_string):
     """将base64字符串转换为字节"""
     try:
@@ -93,10 +203,16 @@ def base64_to_bytes(b64_string):
 
 # ==================== 数据库操作函数 ====================
 
+def clear_data_cache():
+    """正式表写入后清除查询缓存，保证页面显示最新数据"""
+    fetch_from_supabase.clear()
+    fetch_summary_documents.clear()
+
 def save_to_supabase(table_name, data):
-    """保存数据到Supabase"""
+    """保存数据到Supabase（data为字典列表时一次请求批量插入）"""
     try:
         result = supabase.table(table_name).insert(data).execute()
+        clear_data_cache()
         return True, result
     except Exception as e:
         error_msg = str(e)
@@ -104,10 +220,22 @@ def save_to_supabase(table_name, data):
             return False, "数据库权限配置错误，请联系管理员检查RLS策略"
         return False, error_msg
 
-def update_supabase(table_name, data, match_field, match_value):
-    """更新Supabase数据"""
+def upsert_supabase(table_name, data, on_conflict):
+    """插入或更新Supabase数据（按on_conflict字段匹配）"""
+    # work_summary的唯一约束见 migrations/work_summary_unit_name_unique.sql
     try:
-        result = supabase.table(table_name).update(data).eq(match_field, match_value).execute()
+        try:
+            result = supabase.table(table_name).upsert(data, on_conflict=on_conflict).execute()
+        except Exception as e:
+            if "no unique or exclusion constraint" not in str(e).lower():
+                raise
+            # 未执行迁移时退回先查询再更新/插入
+            existing = supabase.table(table_name).select("id").eq(on_conflict, data[on_conflict]).limit(1).execute()
+            if existing.data:
+                result = supabase.table(table_name).update(data).eq(on_conflict, data[on_conflict]).execute()
+            else:
+                result = supabase.table(table_name).insert(data).execute()
+        clear_data_cache()
         return True, result
     except Exception as e:
         error_msg = str(e)
@@ -115,38 +243,97 @@ def update_supabase(table_name, data, match_field, match_value):
             return False, "数据库权限配置错误，请联系管理员检查RLS策略"
         return False, error_msg
 
-def get_from_supabase(table_name, unit_name=None):
+@st.cache_data(ttl=30, show_spinner=False)
+def fetch_from_supabase(table_name, unit_name=None, columns="*"):
+    """查询Supabase数据（缓存30秒，异常不缓存）"""
+    query = supabase.table(table_name).select(columns)
+    if unit_name:
+        query = query.eq("unit_name", unit_name)
+    rows = query.execute().data
+    
+    # 图片链接在写入缓存前解析一次，页面重跑时直接使用列表
+    for row in rows:
+        if 'image_urls' in row:
+            row['image_urls'] = parse_image_urls(row['image_urls'])
+    return rows
+
+def get_from_supabase(table_name, unit_name=None, columns="*"):
     """从Supabase获取数据"""
     try:
-        if unit_name:
-            result = supabase.table(table_name).select("*").eq("unit_name", unit_name).execute()
-        else:
-            result = supabase.table(table_name).select("*").execute()
-        return result.data
+        return fetch_from_supabase(table_name, unit_name, columns)
     except Exception as e:
         st.error(f"读取数据失败: {str(e)}")
         return []
 
+def delete_many_from_supabase(table_name, record_ids):
+    """从Supabase批量删除数据（一次请求）"""
+    try:
+        result = supabase.table(table_name).delete().in_("id", record_ids).execute()
+        clear_data_cache()
+        return True, result
+    except Exception as e:
+        return False, str(e)
+
 def delete_from_supabase(table_name, record_id):
     """从Supabase删除数据"""
     try:
         result = supabase.table(table_name).delete().eq("id", record_id).execute()
+        clear_data_cache()
         return True, result
     except Exception as e:
         return False, str(e)
 
+# 浏览器/CDN缓存时长（秒）：图片路径按内容生成、上传后不再修改，可长期缓存；
+# 年度总结文档可被删除，保持Storage默认的1小时
+STORAGE_CACHE_CONTROL = {"images": "31536000"}
+
+# 公开访问地址前缀，与SDK的get_public_url拼接结果一致，上传后直接拼接无需再调用SDK
+STORAGE_PUBLIC_PREFIX = f"{SUPABASE_URL.rstrip('/')}/storage/v1/object/public/"
+
+# 上传失败时的最多尝试次数（间隔0.5秒、1秒退避）
+UPLOAD_ATTEMPTS = 3
+
+@st.cache_resource
+def get_uploaded_images():
+    """已上传的图片路径（进程内共享；图片路径按内容生成且上传后不会被删除）"""
+    return set()
+
+uploaded_images = get_uploaded_images()
+
 def upload_file_to_storage(file_bytes, file_type, bucket_name, file_path):
     """上传文件到Supabase Storage（使用字节数据）"""
     try:
         file_path = file_path.encode('ascii', 'ignore').decode('ascii')
+        public_url = f"{STORAGE_PUBLIC_PREFIX}{bucket_name}/{file_path}"
         
-        result = supabase.storage.from_(bucket_name).upload(
-            file_path, 
-            file_bytes,
-            {"content-type": file_type, "upsert": "false"}
-        )
+        # 相同内容的图片路径相同，本进程上传过的直接返回链接
+        if bucket_name == "images" and file_path in uploaded_images:
+            return True, public_url
+        
+        for attempt in range(UPLOAD_ATTEMPTS):
+            try:
+                supabase.storage.from_(bucket_name).upload(
+                    file_path, 
+                    file_bytes,
+                    {
+                        "content-type": file_type,
+                        "cache-control": STORAGE_CACHE_CONTROL.get(bucket_name, "3600"),
+                        "upsert": "false"
+                    }
+                )
+                break
+            except Exception as e:
+                duplicate = "duplicate" in str(e).lower()
+                # 图片已存在（upsert=false时服务端返回Duplicate）说明内容相同，直接复用
+                if duplicate and bucket_name == "images":
+                    break
+                # 网络抖动等临时错误退避后重试，重试用尽仍失败才报错
+                if duplicate or attempt == UPLOAD_ATTEMPTS - 1:
+                    raise
+                time.sleep(0.5 * 2 ** attempt)
         
-        public_url = supabase.storage.from_(bucket_name).get_public_url(file_path)
+        if bucket_name == "images":
+            uploaded_images.add(file_path)
         return True, public_url
     except Exception as e:
         return False, str(e)
@@ -164,20 +351,42 @@ def delete_file_from_storage(bucket_name, file_path):
     except Exception as e:
         return False, str(e)
 
+@st.cache_resource
+def get_upload_pool():
+    """并行上传图片、并行查询计数的线程池（进程内共享）"""
+    return ThreadPoolExecutor(max_workers=8)
+
 # ==================== 待提交数据管理函数 ====================
 
+@st.cache_data(ttl=30, show_spinner=False)
+def fetch_pending_data(table_name, unit_name):
+    """查询临时表中的待提交数据（缓存30秒，异常不缓存）"""
+    return supabase.table(table_name).select("*").eq("unit_name", unit_name).execute().data
+
 def load_pending_data(table_name, unit_name):
     """从临时表加载待提交数据"""
     try:
-        result = supabase.table(table_name).select("*").eq("unit_name", unit_name).execute()
-        return result.data
+        return fetch_pending_data(table_name, unit_name)
     except Exception as e:
         return []
 
+def clear_pending_cache():
+    """临时表写入或删除后清除待提交数据缓存"""
+    fetch_pending_data.clear()
+
+def count_rows(table_name, unit_name):
+    """统计单位在表中的记录数（HEAD请求只返回计数，不传输含图片数据的记录）"""
+    try:
+        result = supabase.table(table_name).select("id", count="exact", head=True).eq("unit_name", unit_name).execute()
+        return result.count or 0
+    except Exception as e:
+        return 0
+
 def save_pending_item(table_name, data):
     """保存单条待提交数据到临时表"""
     try:
         result = supabase.table(table_name).insert(data).execute()
+        clear_pending_cache()
         return True, result
     except Exception as e:
         return False, str(e)
@@ -186,32 +395,94 @@ def delete_pending_item(table_name, item_id):
     """从临时表删除单条数据"""
     try:
         result = supabase.table(table_name).delete().eq("id", item_id).execute()
+        clear_pending_cache()
+        return True, result
+    except Exception as e:
+        return False, str(e)
+
+def delete_pending_items(table_name, item_ids):
+    """从临时表批量删除数据（一次请求）"""
+    try:
+        result = supabase.table(table_name).delete().in_("id", item_ids).execute()
+        clear_pending_cache()
         return True, result
     except Exception as e:
         return False, str(e)
 
 # ==================== 数据加载函数 ====================
 
+# 各正式表页面上实际展示的字段，只查询这些列
+SUBMITTED_COLUMNS = {
+    "academic_activities": "id,activity_name,activity_date,description,image_urls",
+    "popular_activities": "id,activity_name,activity_date,description,image_urls",
+    "competitions": "id,competition_name,competition_date,description,image_urls",
+    "awards": "id,award_name,award_date,award_organization,image_urls",
+    "research_projects": "id,project_leader,project_name,project_unit,fund_name,fund_number,fund_amount,project_date",
+    "publications": "id,publication_type,title,journal,author,level,publication_date"
+}
+SUMMARY_DOCUMENT_COLUMNS = "id,document_url,original_filename,uploaded_at"
+
 def load_unit_summary(unit_name):
     """加载单位的年度总结数据"""
-    data = get_from_supabase("work_summary", unit_name)
+    data = get_from_supabase("work_summary", unit_name, "contact_person,contact_phone")
     return data[0] if data else None
 
+@st.cache_data(ttl=30, show_spinner=False)
+def fetch_summary_documents(unit_name):
+    """查询单位的年度总结文档，按上传时间倒序（缓存30秒）"""
+    return supabase.table("summary_documents").select(SUMMARY_DOCUMENT_COLUMNS).eq("unit_name", unit_name).order("uploaded_at", desc=True).execute().data
+
 def load_summary_documents(unit_name):
     """加载单位的所有年度总结文档"""
     try:
-        result = supabase.table("summary_documents").select("*").eq("unit_name", unit_name).order("uploaded_at", desc=True).execute()
-        return result.data
+        return fetch_summary_documents(unit_name)
     except Exception as e:
         st.error(f"读取文档列表失败: {str(e)}")
         return []
 
 def load_activities(table_name, unit_name):
-    """加载活动数据"""
-    return get_from_supabase(table_name, unit_name)
+    """加载活动数据（只查询页面展示的字段）"""
+    return get_from_supabase(table_name, unit_name, SUBMITTED_COLUMNS[table_name])
 
 # ==================== 提交处理函数 ====================
 
+def upload_images(folder, images):
+    """并行上传表单中的图片并显示进度；全部成功返回 (True, 按原顺序的链接)，否则返回 (False, 错误信息)"""
+    upload_pool = get_upload_pool()
+    futures = []
+    for img in images:
+        img_bytes, name, file_type = shrink_image(img.getvalue(), img.name, img.type)
+        file_path = f"{folder}/{generate_content_filename(img_bytes, name)}"
+        futures.append(upload_pool.submit(upload_file_to_storage, img_bytes, file_type, "images", file_path))
+    
+    progress = st.progress(0.0, text="正在上传图片...")
+    for done, _ in enumerate(as_completed(futures), 1):
+        progress.progress(done / len(futures), text=f"正在上传图片 {done}/{len(futures)}")
+    progress.empty()
+    
+    image_urls = []
+    for future in futures:
+        success, result = future.result()
+        if not success:
+            return False, result
+        image_urls.append(result)
+    return True, image_urls
+
+def commit_pending_rows(target_table, pending_table, rows, pending_items):
+    """
+    一次请求批量写入正式表，成功后从临时表删除对应记录
+    整批写入失败时逐条重试，保留能成功的部分；返回已写入的待提交记录
+    """
+    success, result = save_to_supabase(target_table, rows)
+    if success:
+        saved = list(pending_items)
+    else:
+        saved = [item for row, item in zip(rows, pending_items) if save_to_supabase(target_table, row)[0]]
+    
+    if saved:
+        delete_pending_items(pending_table, [item['id'] for item in saved])
+    return saved
+
 def submit_pending_activities(pending_data, unit_name, activity_type, target_table, pending_table):
     """
     统一的待提交活动提交处理函数
@@ -219,43 +490,63 @@ def submit_pending_activities(pending_data, unit_name, activity_type, target_tab
     """
     success_count = 0
     failed_items = []
+    rows = []
+    submitted = []
     safe_unit_folder = get_unit_safe_name(unit_name)
+    upload_pool = get_upload_pool()
+    # 同一批次的记录共用一个提交时间
+    created_at = datetime.now().isoformat()
     
+    # 先把所有记录的图片上传任务提交到线程池并行执行，再按原顺序收集链接
+    uploads = []
     for activity in pending_data:
+        futures = []
+        if activity.get('image_data'):
+            try:
+                image_info = json_loads(activity['image_data'])
+                
+                # 根据活动类型选择名称字段
+                if activity_type == 'award':
+                    activity_name = activity['award_name']
+                elif activity_type == 'competition':
+                    activity_name = activity['competition_name']
+                else:
+                    activity_name = activity['activity_name']
+                safe_activity_name = sanitize_path(activity_name[:30])
+                
+                for img_idx, img_data in enumerate(image_info):
+                    # 从base64还原字节数据
+                    img_bytes = base64_to_bytes(img_data['data'])
+                    if not img_bytes:
+                        raise ValueError(f"第{img_idx+1}张图片数据无法解码")
+                    safe_filename = generate_content_filename(img_bytes, img_data['name'])
+                    file_path = f"{safe_unit_folder}/{activity_type}/{safe_activity_name}/{safe_filename}"
+                    futures.append(upload_pool.submit(
+                        upload_file_to_storage,
+                        img_bytes, 
+                        img_data['type'], 
+                        "images", 
+                        file_path
+                    ))
+            except Exception as e:
+                # 图片准备失败的记录标记为None，稍后保留在待提交中，不写入缺图的数据
+                st.warning(f"处理图片时出错，该条记录保留在待提交中: {str(e)}")
+                futures = None
+        uploads.append(futures)
+    
+    for activity, futures in zip(pending_data, uploads):
+        if futures is None:
+            failed_items.append(activity)
+            continue
         try:
-            image_urls = []
-            
-            # 处理图片
-            if activity.get('image_data'):
-                try:
-                    image_info = json.loads(activity['image_data'])
-                    for img_idx, img_data in enumerate(image_info):
-                        # 从base64还原字节数据
-                        img_bytes = base64_to_bytes(img_data['data'])
-                        if img_bytes:
-                            safe_filename = generate_safe_filename(img_data['name'], prefix=f"{activity_type}_{img_idx}")
-                            
-                            # 根据活动类型选择名称字段
-                            if activity_type == 'award':
-                                activity_name = activity['award_name']
-                            elif activity_type == 'competition':
-                                activity_name = activity['competition_name']
-                            else:
-                                activity_name = activity['activity_name']
-                            
-                            safe_activity_name = sanitize_path(activity_name[:30])
-                            file_path = f"{safe_unit_folder}/{activity_type}/{safe_activity_name}/{safe_filename}"
-                            
-                            success, result = upload_file_to_storage(
-                                img_bytes, 
-                                img_data['type'], 
-                                "images", 
-                                file_path
-                            )
-                            if success:
-                                image_urls.append(result)
-                except Exception as e:
-                    st.warning(f"处理图片时出错: {str(e)}")
+            results = [future.result() for future in futures]
+            upload_errors = [result for success, result in results if not success]
+            # 有图片上传失败的记录不写入正式表，保留在待提交中以便重新提交
+            if upload_errors:
+                failed_items.append(activity)
+                st.error(f"图片上传失败，该条记录保留在待提交中: {upload_errors[0]}")
+                continue
+            image_urls = [result for success, result in results]
             
             # 构建数据字典
             if activity_type == 'award':
@@ -264,8 +555,8 @@ def submit_pending_activities(pending_data, unit_name, activity_type, target_tab
                     "award_date": activity['award_date'],
                     "award_name": activity['award_name'],
                     "award_organization": activity['award_organization'],
-                    "image_urls": json.dumps(image_urls),
-                    "created_at": datetime.now().isoformat()
+                    "image_urls": json_dumps(image_urls),
+                    "created_at": created_at
                 }
             elif activity_type == 'competition':
                 data = {
@@ -273,8 +564,8 @@ def submit_pending_activities(pending_data, unit_name, activity_type, target_tab
                     "competition_date": activity['competition_date'],
                     "competition_name": activity['competition_name'],
                     "description": activity['description'],
-                    "image_urls": json.dumps(image_urls),
-                    "created_at": datetime.now().isoformat()
+                    "image_urls": json_dumps(image_urls),
+                    "created_at": created_at
                 }
             else:  # academic or popular
                 data = {
@@ -282,366 +573,345 @@ def submit_pending_activities(pending_data, unit_name, activity_type, target_tab
                     "activity_date": activity['activity_date'],
                     "activity_name": activity['activity_name'],
                     "description": activity['description'],
-                    "image_urls": json.dumps(image_urls),
-                    "created_at": datetime.now().isoformat()
+                    "image_urls": json_dumps(image_urls),
+                    "created_at": created_at
                 }
             
-            # 保存到正式表
-            success, result = save_to_supabase(target_table, data)
-            if success:
-                success_count += 1
-                # 从临时表删除
-                delete_pending_item(pending_table, activity['id'])
-            else:
-                failed_items.append(activity)
+            rows.append(data)
+            submitted.append(activity)
         except Exception as e:
             failed_items.append(activity)
             st.error(f"处理记录时出错: {str(e)}")
     
+    # 所有记录一次请求写入正式表
+    if rows:
+        saved = commit_pending_rows(target_table, pending_table, rows, submitted)
+        success_count = len(saved)
+        saved_ids = {activity['id'] for activity in saved}
+        failed_items.extend(activity for activity in submitted if activity['id'] not in saved_ids)
+    
     return success_count, failed_items
 
-# ==================== 主程序 ====================
+# ==================== 标签页渲染函数 ====================
 
-def main():
-    st.title("💊 揭阳市医学会临床药学分会数据收集系统")
-    st.markdown("---")
-    
-    # 单位信息
-    st.header("📋 单位信息")
-    
-    st.info("💡 **重要提示：** 请各成员单位指定专人负责本单位信息的填报工作，确保数据准确性。填报过程中报错或有任何问题请联系学会秘书（黄晓杰，18318149900）。")
+# 已提交/待提交记录表格的展示列（字段 -> 表头）
+ACTIVITY_TABLE_COLUMNS = {
+    'activity_name': '活动名称',
+    'activity_date': '活动日期',
+    'description': '活动简介'
+}
+COMPETITION_TABLE_COLUMNS = {
+    'competition_name': '竞赛名称',
+    'competition_date': '竞赛日期',
+    'description': '竞赛简介'
+}
+AWARD_TABLE_COLUMNS = {
+    'award_name': '奖项名称',
+    'award_date': '获奖日期',
+    'award_organization': '颁奖单位'
+}
+PROJECT_TABLE_COLUMNS = {
+    'project_leader': '项目负责人',
+    'project_name': '项目名称',
+    'project_unit': '立项单位',
+    'fund_name': '基金名称',
+    'fund_number': '编号',
+    'fund_amount': '资助金额（万元）',
+    'project_date': '立项时间'
+}
+PUBLICATION_TABLE_COLUMNS = {
+    'publication_type': '类型',
+    'title': '题目',
+    'journal': '刊物名称',
+    'author': '作者',
+    'level': '刊物等级',
+    'publication_date': '发表时间'
+}
+
+def submitted_records_table(table_name, records, columns):
+    """以表格展示已提交记录（含图片的记录显示首图预览及每张图片的链接），勾选行后一次请求批量删除"""
+    df = records_to_table(records, columns)
+    column_config = {}
+    if 'image_urls' in records[0]:
+        df['预览'] = [record['image_urls'][0] if record['image_urls'] else None for record in records]
+        df['图片数量'] = [len(record['image_urls']) for record in records]
+        column_config['预览'] = st.column_config.ImageColumn('预览')
+        # 每张图片一列链接，点击可查看原图
+        max_images = max(len(record['image_urls']) for record in records)
+        for img_idx in range(max_images):
+            col_name = f"图片{img_idx+1}"
+            df[col_name] = [
+                record['image_urls'][img_idx] if img_idx < len(record['image_urls']) else None
+                for record in records
+            ]
+            column_config[col_name] = st.column_config.LinkColumn(col_name, display_text="查看")
     
-    unit_name = st.text_input(
-        "请输入单位名称*", 
-        placeholder="例如：揭阳市人民医院", 
-        key="unit_name_input",
-        help="请填写单位全称"
+    event = st.dataframe(
+        df,
+        use_container_width=True,
+        hide_index=True,
+        column_config=column_config,
+        on_select="rerun",
+        selection_mode="multi-row",
+        key=f"submitted_table_{table_name}"
     )
+    # 删除后行号可能越界，忽略失效的选择
+    selected = [records[row]['id'] for row in event.selection.rows if row < len(records)]
     
-    if not unit_name:
-        st.warning("⚠️ 请先填写单位名称后再继续填报")
-        return
-    
-    # 加载该单位的历史数据
-    summary_data = load_unit_summary(unit_name)
+    st.caption("勾选表格左侧的行后可批量删除")
+    if st.button("🗑️ 删除所选记录", key=f"del_selected_{table_name}", disabled=not selected):
+        success, _ = delete_many_from_supabase(table_name, selected)
+        if success:
+            st.success(f"已删除 {len(selected)} 条记录！")
+            # 清除表格选择，避免旧行号指向其他记录
+            st.session_state.pop(f"submitted_table_{table_name}", None)
+            st.rerun()
+        else:
+            st.error("删除失败，请重试")
+
+def records_to_table(records, columns):
+    """直接从记录列表取展示列构建表格，不再逐行拼字典"""
+    return pd.DataFrame(records, columns=list(columns)).rename(columns=columns)
+
+# ========== 年度总结与计划 ==========
+@st.fragment
+def render_summary_tab(unit_name, contact_person, contact_phone):
+    """年度总结与计划标签页（局部刷新：本页内的操作只重跑本标签页）"""
+    st.subheader("2025年度总结与2026年计划")
+    st.info("💡 提示：请将年度总结和计划合并为一个Word文档上传。支持上传多个版本，所有版本都会被保存。")
     
-    # 预填联系信息
-    default_contact = summary_data.get('contact_person', '') if summary_data else ''
-    default_phone = summary_data.get('contact_phone', '') if summary_data else ''
+    # 显示已上传的文档列表
+    uploaded_docs = load_summary_documents(unit_name)
     
-    contact_person = st.text_input(
-        "联系人*", 
-        value=default_contact, 
-        placeholder="请输入联系人姓名",
-        help="请填写负责本单位数据填报的联系人"
-    )
+    if uploaded_docs:
+        st.success(f"✅ 您已上传 {len(uploaded_docs)} 个版本的年度总结与计划")
+        with st.expander("📄 查看已上传的文档", expanded=True):
+            for idx, doc in enumerate(uploaded_docs, 1):
+                col1, col2, col3 = st.columns([6, 2, 2])
+                
+                with col1:
+                    st.write(f"**版本 {idx}**")
+                    st.write(f"上传时间：{doc.get('uploaded_at', '未知')[:19]}")
+                    st.write(f"原文件名：{doc.get('original_filename', '未知')}")
+                    st.markdown(f"[📄 下载文档]({doc['document_url']})")
+                
+                with col2:
+                    if idx == 1:
+                        st.success("当前版本")
+                
+                with col3:
+                    if st.button(f"🗑️ 删除", key=f"del_doc_{doc['id']}"):
+                        file_success, _ = delete_file_from_storage("documents", doc['document_url'])
+                        db_success, _ = delete_from_supabase("summary_documents", doc['id'])
+                        
+                        if file_success and db_success:
+                            st.success("删除成功！")
+                            st.rerun()
+                        else:
+                            st.error("删除失败，请重试")
+                
+                st.markdown("---")
     
-    contact_phone = st.text_input(
-        "联系电话*", 
-        value=default_phone, 
-        placeholder="请输入11位手机号码",
-        max_chars=11,
-        help="请输入11位手机号码"
+    summary_plan_file = st.file_uploader(
+        "上传年度总结与计划文档（Word文档）*",
+        type=['doc', 'docx'],
+        key="summary_plan",
+        help="支持上传多次，每次上传都会保存为新版本"
     )
     
-    # 验证手机号
-    if contact_phone and not validate_phone(contact_phone):
-        st.error("❌ 请输入正确的11位手机号码")
-    
-    # 显示转换后的路径（用于调试）
-    with st.expander("🔍 调试信息（可选查看）"):
-        safe_folder = get_unit_safe_name(unit_name)
-        st.code(f"单位名称: {unit_name}\n文件夹路径: {safe_folder}")
-    
-    st.markdown("---")
-    
-    # 创建标签页
-    tabs = st.tabs([
-        "📄 年度总结与计划",
-        "🎓 学术活动",
-        "📢 科普活动",
-        "🏆 技能竞赛",
-        "🥇 获奖情况",
-        "🔬 科研立项",
-        "📚 论文发表",
-        "📊 提交概览"
-    ])
-    
-    # ========== 年度总结与计划 ==========
-    with tabs[0]:
-        st.subheader("2025年度总结与2026年计划")
-        st.info("💡 提示：请将年度总结和计划合并为一个Word文档上传。支持上传多个版本，所有版本都会被保存。")
-        
-        # 显示已上传的文档列表
-        uploaded_docs = load_summary_documents(unit_name)
-        
-        if uploaded_docs:
-            st.success(f"✅ 您已上传 {len(uploaded_docs)} 个版本的年度总结与计划")
-            with st.expander("📄 查看已上传的文档", expanded=True):
-                for idx, doc in enumerate(uploaded_docs, 1):
-                    col1, col2, col3 = st.columns([6, 2, 2])
-                    
-                    with col1:
-                        st.write(f"**版本 {idx}**")
-                        st.write(f"上传时间：{doc.get('uploaded_at', '未知')[:19]}")
-                        st.write(f"原文件名：{doc.get('original_filename', '未知')}")
-                        st.markdown(f"[📄 下载文档]({doc['document_url']})")
+    if st.button("💾 上传年度总结与计划", key="save_summary_plan", type="primary"):
+        if not contact_person or not contact_phone:
+            st.error("❌ 请填写完整的联系人和联系电话")
+        elif not validate_phone(contact_phone):
+            st.error("❌ 请输入正确的11位手机号码")
+        elif summary_plan_file:
+            with st.spinner("正在上传文档..."):
+                try:
+                    safe_filename = generate_safe_filename(summary_plan_file.name, prefix="summary")
+                    safe_unit_folder = get_unit_safe_name(unit_name)
+                    file_path = f"{safe_unit_folder}/summary/{safe_filename}"
                     
-                    with col2:
-                        if idx == 1:
-                            st.success("当前版本")
+                    st.info(f"📁 上传路径: {file_path}")
                     
-                    with col3:
-                        if st.button(f"🗑️ 删除", key=f"del_doc_{doc['id']}"):
-                            file_success, _ = delete_file_from_storage("documents", doc['document_url'])
-                            db_success, _ = delete_from_supabase("summary_documents", doc['id'])
-                            
-                            if file_success and db_success:
-                                st.success("删除成功！")
-                                st.rerun()
-                            else:
-                                st.error("删除失败，请重试")
+                    success, result = upload_file_to_storage(
+                        summary_plan_file.getvalue(),
+                        summary_plan_file.type,
+                        "documents",
+                        file_path
+                    )
                     
-                    st.markdown("---")
-        
-        summary_plan_file = st.file_uploader(
-            "上传年度总结与计划文档（Word文档）*",
-            type=['doc', 'docx'],
-            key="summary_plan",
-            help="支持上传多次，每次上传都会保存为新版本"
-        )
-        
-        if st.button("💾 上传年度总结与计划", key="save_summary_plan", type="primary"):
-            if not contact_person or not contact_phone:
-                st.error("❌ 请填写完整的联系人和联系电话")
-            elif not validate_phone(contact_phone):
-                st.error("❌ 请输入正确的11位手机号码")
-            elif summary_plan_file:
-                with st.spinner("正在上传文档..."):
-                    try:
-                        safe_filename = generate_safe_filename(summary_plan_file.name, prefix="summary")
-                        safe_unit_folder = get_unit_safe_name(unit_name)
-                        file_path = f"{safe_unit_folder}/summary/{safe_filename}"
+                    if success:
+                        document_url = result
                         
-                        st.info(f"📁 上传路径: {file_path}")
+                        doc_data = {
+                            "unit_name": unit_name,
+                            "document_url": document_url,
+                            "original_filename": summary_plan_file.name,
+                            "uploaded_at": datetime.now().isoformat()
+                        }
+                        doc_success, doc_result = save_to_supabase("summary_documents", doc_data)
                         
-                        success, result = upload_file_to_storage(
-                            summary_plan_file.getvalue(),
-                            summary_plan_file.type,
-                            "documents",
-                            file_path
-                        )
+                        summary_update_data = {
+                            "unit_name": unit_name,
+                            "contact_person": contact_person,
+                            "contact_phone": contact_phone,
+                            "summary_url": document_url,
+                            "updated_at": datetime.now().isoformat()
+                        }
                         
-                        if success:
-                            document_url = result
-                            
-                            doc_data = {
-                                "unit_name": unit_name,
-                                "document_url": document_url,
-                                "original_filename": summary_plan_file.name,
-                                "uploaded_at": datetime.now().isoformat()
-                            }
-                            doc_success, doc_result = save_to_supabase("summary_documents", doc_data)
-                            
-                            summary_update_data = {
-                                "unit_name": unit_name,
-                                "contact_person": contact_person,
-                                "contact_phone": contact_phone,
-                                "summary_url": document_url,
-                                "updated_at": datetime.now().isoformat()
-                            }
-                            
-                            existing = get_from_supabase("work_summary", unit_name)
-                            if existing:
-                                success, result = update_supabase("work_summary", summary_update_data, "unit_name", unit_name)
-                            else:
-                                success, result = save_to_supabase("work_summary", summary_update_data)
-                            
-                            if success and doc_success:
-                                st.success("✅ 上传成功！文档已保存为新版本")
-                                st.info(f"📄 原文件名：{summary_plan_file.name}")
-                                st.rerun()
-                            else:
-                                st.error(f"❌ 数据库保存失败")
+                        # 一次请求完成新增或更新（依赖unit_name唯一约束）
+                        success, result = upsert_supabase("work_summary", summary_update_data, "unit_name")
+                        
+                        if success and doc_success:
+                            st.success("✅ 上传成功！文档已保存为新版本")
+                            st.info(f"📄 原文件名：{summary_plan_file.name}")
+                            st.rerun()
                         else:
-                            st.error(f"❌ 文档上传失败: {result}")
-                    except Exception as e:
-                        st.error(f"❌ 上传过程出错: {str(e)}")
-            else:
-                st.warning("⚠️ 请选择要上传的文档")
+                            st.error(f"❌ 数据库保存失败")
+                    else:
+                        st.error(f"❌ 文档上传失败: {result}")
+                except Exception as e:
+                    st.error(f"❌ 上传过程出错: {str(e)}")
+        else:
+            st.warning("⚠️ 请选择要上传的文档")
+
+
+# ========== 学术活动 ==========
+@st.fragment
+def render_academic_tab(unit_name):
+    """学术活动标签页（局部刷新：本页内的操作只重跑本标签页）"""
+    st.subheader("学术活动登记")
     
-    # ========== 学术活动 ==========
-    with tabs[1]:
-        st.subheader("学术活动登记")
+    submitted_academic = load_activities("academic_activities", unit_name)
+    
+    if submitted_academic:
+        st.success(f"✅ 您已提交 {len(submitted_academic)} 条学术活动")
+        with st.expander("📋 查看已提交的学术活动", expanded=False):
+            submitted_records_table("academic_activities", submitted_academic, ACTIVITY_TABLE_COLUMNS)
+    
+    pending_academic = load_pending_data("pending_academic_activities", unit_name)
+    
+    if pending_academic:
+        st.markdown("### 📝 待提交的学术活动")
+        st.warning(f"⏳ 您有 {len(pending_academic)} 条待提交的学术活动")
         
-        submitted_academic = load_activities("academic_activities", unit_name)
+        for idx, activity in enumerate(pending_academic):
+            with st.expander(f"⏳ {idx+1}. {activity['activity_name']} - {activity['activity_date']}", expanded=False):
+                st.write(f"**活动日期：** {activity['activity_date']}")
+                st.write(f"**活动名称：** {activity['activity_name']}")
+                st.write(f"**活动简介：** {activity['description']}")
+                
+                if activity.get('image_data'):
+                    try:
+                        image_info = json_loads(activity['image_data'])
+                        if image_info:
+                            st.write(f"**活动图片：** {len(image_info)}张")
+                            cols = st.columns(min(len(image_info), 3))
+                            for img_idx, img_data in enumerate(image_info):
+                                with cols[img_idx % 3]:
+                                    try:
+                                        # 优先显示缩略图，早期暂存的记录没有缩略图时显示原图
+                                        img_bytes = base64_to_bytes(img_data.get('thumb') or img_data['data'])
+                                        if img_bytes:
+                                            st.image(img_bytes, caption=f"图片 {img_idx+1}", use_container_width=True)
+                                    except Exception:
+                                        pass
+                    except Exception:
+                        pass
+                
+                if st.button(f"🗑️ 删除此条", key=f"del_pending_academic_{activity['id']}"):
+                    success, _ = delete_pending_item("pending_academic_activities", activity['id'])
+                    if success:
+                        st.success("删除成功！")
+                        st.rerun()
         
-        if submitted_academic:
-            st.success(f"✅ 您已提交 {len(submitted_academic)} 条学术活动")
-            with st.expander("📋 查看已提交的学术活动", expanded=False):
-                for idx, activity in enumerate(submitted_academic, 1):
-                    st.markdown(f"### {idx}. {activity['activity_name']} ({activity['activity_date']})")
-                    st.write(f"**简介：** {activity['description']}")
-                    
-                    image_urls = json.loads(activity.get('image_urls', '[]'))
-                    if image_urls:
-                        st.write(f"**图片：** {len(image_urls)}张")
-                        cols = st.columns(min(len(image_urls), 3))
-                        for img_idx, img_url in enumerate(image_urls):
-                            with cols[img_idx % 3]:
-                                try:
-                                    st.image(img_url, use_container_width=True)
-                                except:
-                                    st.markdown(f"[🖼️ 查看图片]({img_url})")
+        col1, col2 = st.columns([3, 1])
+        with col2:
+            if st.button("💾 提交全部待提交内容", key="submit_all_pending_academic", type="primary", use_container_width=True):
+                with st.spinner("正在提交数据..."):
+                    success_count, failed_items = submit_pending_activities(
+                        pending_academic, 
+                        unit_name, 
+                        'academic',
+                        'academic_activities',
+                        'pending_academic_activities'
+                    )
                     
-                    if st.button(f"🗑️ 删除此条记录", key=f"del_submitted_academic_{activity['id']}"):
-                        success, _ = delete_from_supabase("academic_activities", activity['id'])
-                        if success:
-                            st.success("删除成功！")
-                            st.rerun()
-                        else:
-                            st.error("删除失败，请重试")
-                    st.markdown("---")
+                    if success_count == len(pending_academic):
+                        st.success(f"✅ 成功提交{success_count}条学术活动记录！")
+                        st.rerun()
+                    elif success_count > 0:
+                        st.warning(f"⚠️ 成功提交{success_count}条，失败{len(failed_items)}条")
+                    else:
+                        st.error(f"❌ 提交失败，请检查数据或联系管理员")
         
-        pending_academic = load_pending_data("pending_academic_activities", unit_name)
+        st.markdown("---")
+    
+    with st.form(key="academic_form_new"):
+        st.markdown("### ➕ 添加学术活动")
         
-        if pending_academic:
-            st.markdown("### 📝 待提交的学术活动")
-            st.warning(f"⏳ 您有 {len(pending_academic)} 条待提交的学术活动")
-            
-            for idx, activity in enumerate(pending_academic):
-                with st.expander(f"⏳ {idx+1}. {activity['activity_name']} - {activity['activity_date']}", expanded=False):
-                    st.write(f"**活动日期：** {activity['activity_date']}")
-                    st.write(f"**活动名称：** {activity['activity_name']}")
-                    st.write(f"**活动简介：** {activity['description']}")
-                    
-                    if activity.get('image_data'):
-                        try:
-                            image_info = json.loads(activity['image_data'])
-                            if image_info:
-                                st.write(f"**活动图片：** {len(image_info)}张")
-                                cols = st.columns(min(len(image_info), 3))
-                                for img_idx, img_data in enumerate(image_info):
-                                    with cols[img_idx % 3]:
-                                        try:
-                                            img_bytes = base64_to_bytes(img_data['data'])
-                                            if img_bytes:
-                                                st.image(img_bytes, caption=f"图片 {img_idx+1}", use_container_width=True)
-                                        except:
-                                            pass
-                        except:
-                            pass
-                    
-                    if st.button(f"🗑️ 删除此条", key=f"del_pending_academic_{activity['id']}"):
-                        success, _ = delete_pending_item("pending_academic_activities", activity['id'])
+        col1, col2 = st.columns(2)
+        with col1:
+            activity_date = st.date_input("活动日期*")
+        with col2:
+            activity_name = st.text_input("活动名称*")
+        
+        activity_desc = st.text_area("活动简介*", height=100)
+        
+        activity_images = st.file_uploader(
+            "上传活动图片（最多3张）",
+            type=['jpg', 'jpeg', 'png'],
+            accept_multiple_files=True,
+            key="academic_images_new"
+        )
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            submit_and_continue = st.form_submit_button("✅ 添加到待提交", use_container_width=True)
+        with col2:
+            submit_final = st.form_submit_button("💾 添加并立即提交", type="primary", use_container_width=True)
+        
+        if submit_and_continue or submit_final:
+            if activity_name and activity_desc:
+                if activity_images and len(activity_images) > 3:
+                    st.error("❌ 最多只能上传3张图片")
+                else:
+                    if submit_and_continue:
+                        # 只有暂存到待提交时才需要base64编码，立即提交直接上传原始字节
+                        image_data_list = images_to_data_list(activity_images)
+                        pending_data = {
+                            "unit_name": unit_name,
+                            "activity_date": str(activity_date),
+                            "activity_name": activity_name,
+                            "description": activity_desc,
+                            "image_data": json_dumps(image_data_list) if image_data_list else None
+                        }
+                        success, result = save_pending_item("pending_academic_activities", pending_data)
                         if success:
-                            st.success("删除成功！")
-                            st.rerun()
-            
-            col1, col2 = st.columns([3, 1])
-            with col2:
-                if st.button("💾 提交全部待提交内容", key="submit_all_pending_academic", type="primary", use_container_width=True):
-                    with st.spinner("正在提交数据..."):
-                        success_count, failed_items = submit_pending_activities(
-                            pending_academic, 
-                            unit_name, 
-                            'academic',
-                            'academic_activities',
-                            'pending_academic_activities'
-                        )
-                        
-                        if success_count == len(pending_academic):
-                            st.success(f"✅ 成功提交{success_count}条学术活动记录！")
+                            st.success(f"✅ 已添加到待提交：{activity_name}")
+                            st.info("💡 请点击上方【提交全部待提交内容】按钮完成提交，或继续添加更多活动")
                             st.rerun()
-                        elif success_count > 0:
-                            st.warning(f"⚠️ 成功提交{success_count}条，失败{len(failed_items)}条")
                         else:
-                            st.error(f"❌ 提交失败，请检查数据或联系管理员")
-            
-            st.markdown("---")
-        
-        with st.form(key="academic_form_new"):
-            st.markdown("### ➕ 添加学术活动")
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                activity_date = st.date_input("活动日期*")
-            with col2:
-                activity_name = st.text_input("活动名称*")
-            
-            activity_desc = st.text_area("活动简介*", height=100)
-            
-            activity_images = st.file_uploader(
-                "上传活动图片（最多3张）",
-                type=['jpg', 'jpeg', 'png'],
-                accept_multiple_files=True,
-                key="academic_images_new"
-            )
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                submit_and_continue = st.form_submit_button("✅ 添加到待提交", use_container_width=True)
-            with col2:
-                submit_final = st.form_submit_button("💾 添加并立即提交", type="primary", use_container_width=True)
-            
-            if submit_and_continue or submit_final:
-                if activity_name and activity_desc:
-                    if activity_images and len(activity_images) > 3:
-                        st.error("❌ 最多只能上传3张图片")
-                    else:
-                        image_data_list = []
-                        if activity_images:
-                            for img in activity_images:
-                                b64_data = file_to_base64(img)
-                                if b64_data:
-                                    image_data_list.append({
-                                        'name': img.name,
-                                        'type': img.type,
-                                        'data': b64_data
-                                    })
-                        
-                        if submit_and_continue:
-                            pending_data = {
-                                "unit_name": unit_name,
-                                "activity_date": str(activity_date),
-                                "activity_name": activity_name,
-                                "description": activity_desc,
-                                "image_data": json.dumps(image_data_list) if image_data_list else None
-                            }
-                            success, result = save_pending_item("pending_academic_activities", pending_data)
-                            if success:
-                                st.success(f"✅ 已添加到待提交：{activity_name}")
-                                st.info("💡 请点击上方【提交全部待提交内容】按钮完成提交，或继续添加更多活动")
-                                st.rerun()
+                            st.error(f"❌ 保存失败: {result}")
+                    
+                    elif submit_final:
+                        with st.spinner("正在上传数据..."):
+                            upload_ok, image_urls = True, []
+                            if activity_images:
+                                safe_activity_name = sanitize_path(activity_name[:30])
+                                folder = f"{get_unit_safe_name(unit_name)}/academic/{safe_activity_name}"
+                                upload_ok, image_urls = upload_images(folder, activity_images)
+                            
+                            # 有图片上传失败时不写入记录，避免提交缺图的数据
+                            if not upload_ok:
+                                st.error(f"❌ 图片上传失败，记录未提交，请重试: {image_urls}")
                             else:
-                                st.error(f"❌ 保存失败: {result}")
-                        
-                        elif submit_final:
-                            with st.spinner("正在上传数据..."):
-                                image_urls = []
-                                safe_unit_folder = get_unit_safe_name(unit_name)
-                                
-                                if activity_images:
-                                    for img_idx, img in enumerate(activity_images):
-                                        safe_filename = generate_safe_filename(img.name, prefix=f"academic_{img_idx}")
-                                        safe_activity_name = sanitize_path(activity_name[:30])
-                                        file_path = f"{safe_unit_folder}/academic/{safe_activity_name}/{safe_filename}"
-                                        
-                                        success, result = upload_file_to_storage(
-                                            img.getvalue(),
-                                            img.type,
-                                            "images",
-                                            file_path
-                                        )
-                                        if success:
-                                            image_urls.append(result)
-                                
                                 data = {
                                     "unit_name": unit_name,
                                     "activity_date": str(activity_date),
                                     "activity_name": activity_name,
                                     "description": activity_desc,
-                                    "image_urls": json.dumps(image_urls),
+                                    "image_urls": json_dumps(image_urls),
                                     "created_at": datetime.now().isoformat()
                                 }
                                 success, result = save_to_supabase("academic_activities", data)
@@ -650,181 +920,146 @@ def main():
                                     st.rerun()
                                 else:
                                     st.error(f"❌ 提交失败: {result}")
-                else:
-                    st.error("❌ 请填写所有必填项（标有*）")
-    
-    # ========== 科普活动 ========== 
-    with tabs[2]:
-        st.subheader("科普活动登记")
+            else:
+                st.error("❌ 请填写所有必填项（标有*）")
+
+
+# ========== 科普活动 ==========
+@st.fragment
+def render_popular_tab(unit_name):
+    """科普活动标签页（局部刷新：本页内的操作只重跑本标签页）"""
+    st.subheader("科普活动登记")
+    
+    submitted_popular = load_activities("popular_activities", unit_name)
+    
+    if submitted_popular:
+        st.success(f"✅ 您已提交 {len(submitted_popular)} 条科普活动")
+        with st.expander("📋 查看已提交的科普活动", expanded=False):
+            submitted_records_table("popular_activities", submitted_popular, ACTIVITY_TABLE_COLUMNS)
+    
+    pending_popular = load_pending_data("pending_popular_activities", unit_name)
+    
+    if pending_popular:
+        st.markdown("### 📝 待提交的科普活动")
+        st.warning(f"⏳ 您有 {len(pending_popular)} 条待提交的科普活动")
         
-        submitted_popular = load_activities("popular_activities", unit_name)
+        for idx, activity in enumerate(pending_popular):
+            with st.expander(f"⏳ {idx+1}. {activity['activity_name']} - {activity['activity_date']}", expanded=False):
+                st.write(f"**活动日期：** {activity['activity_date']}")
+                st.write(f"**活动名称：** {activity['activity_name']}")
+                st.write(f"**活动简介：** {activity['description']}")
+                
+                if activity.get('image_data'):
+                    try:
+                        image_info = json_loads(activity['image_data'])
+                        if image_info:
+                            st.write(f"**活动图片：** {len(image_info)}张")
+                            cols = st.columns(min(len(image_info), 3))
+                            for img_idx, img_data in enumerate(image_info):
+                                with cols[img_idx % 3]:
+                                    try:
+                                        # 优先显示缩略图，早期暂存的记录没有缩略图时显示原图
+                                        img_bytes = base64_to_bytes(img_data.get('thumb') or img_data['data'])
+                                        if img_bytes:
+                                            st.image(img_bytes, caption=f"图片 {img_idx+1}", use_container_width=True)
+                                    except Exception:
+                                        pass
+                    except Exception:
+                        pass
+                
+                if st.button(f"🗑️ 删除此条", key=f"del_pending_popular_{activity['id']}"):
+                    success, _ = delete_pending_item("pending_popular_activities", activity['id'])
+                    if success:
+                        st.success("删除成功！")
+                        st.rerun()
         
-        if submitted_popular:
-            st.success(f"✅ 您已提交 {len(submitted_popular)} 条科普活动")
-            with st.expander("📋 查看已提交的科普活动", expanded=False):
-                for idx, activity in enumerate(submitted_popular, 1):
-                    st.markdown(f"### {idx}. {activity['activity_name']} ({activity['activity_date']})")
-                    st.write(f"**简介：** {activity['description']}")
-                    
-                    image_urls = json.loads(activity.get('image_urls', '[]'))
-                    if image_urls:
-                        st.write(f"**图片：** {len(image_urls)}张")
-                        cols = st.columns(min(len(image_urls), 3))
-                        for img_idx, img_url in enumerate(image_urls):
-                            with cols[img_idx % 3]:
-                                try:
-                                    st.image(img_url, use_container_width=True)
-                                except:
-                                    st.markdown(f"[🖼️ 查看图片]({img_url})")
+        col1, col2 = st.columns([3, 1])
+        with col2:
+            if st.button("💾 提交全部待提交内容", key="submit_all_pending_popular", type="primary", use_container_width=True):
+                with st.spinner("正在提交数据..."):
+                    success_count, failed_items = submit_pending_activities(
+                        pending_popular,
+                        unit_name,
+                        'popular',
+                        'popular_activities',
+                        'pending_popular_activities'
+                    )
                     
-                    if st.button(f"🗑️ 删除此条记录", key=f"del_submitted_popular_{activity['id']}"):
-                        success, _ = delete_from_supabase("popular_activities", activity['id'])
-                        if success:
-                            st.success("删除成功！")
-                            st.rerun()
-                        else:
-                            st.error("删除失败，请重试")
-                    st.markdown("---")
+                    if success_count == len(pending_popular):
+                        st.success(f"✅ 成功提交{success_count}条科普活动记录！")
+                        st.rerun()
+                    elif success_count > 0:
+                        st.warning(f"⚠️ 成功提交{success_count}条，失败{len(failed_items)}条")
+                    else:
+                        st.error(f"❌ 提交失败，请检查数据或联系管理员")
         
-        pending_popular = load_pending_data("pending_popular_activities", unit_name)
+        st.markdown("---")
+    
+    with st.form(key="popular_form_new"):
+        st.markdown("### ➕ 添加科普活动")
         
-        if pending_popular:
-            st.markdown("### 📝 待提交的科普活动")
-            st.warning(f"⏳ 您有 {len(pending_popular)} 条待提交的科普活动")
-            
-            for idx, activity in enumerate(pending_popular):
-                with st.expander(f"⏳ {idx+1}. {activity['activity_name']} - {activity['activity_date']}", expanded=False):
-                    st.write(f"**活动日期：** {activity['activity_date']}")
-                    st.write(f"**活动名称：** {activity['activity_name']}")
-                    st.write(f"**活动简介：** {activity['description']}")
-                    
-                    if activity.get('image_data'):
-                        try:
-                            image_info = json.loads(activity['image_data'])
-                            if image_info:
-                                st.write(f"**活动图片：** {len(image_info)}张")
-                                cols = st.columns(min(len(image_info), 3))
-                                for img_idx, img_data in enumerate(image_info):
-                                    with cols[img_idx % 3]:
-                                        try:
-                                            img_bytes = base64_to_bytes(img_data['data'])
-                                            if img_bytes:
-                                                st.image(img_bytes, caption=f"图片 {img_idx+1}", use_container_width=True)
-                                        except:
-                                            pass
-                        except:
-                            pass
-                    
-                    if st.button(f"🗑️ 删除此条", key=f"del_pending_popular_{activity['id']}"):
-                        success, _ = delete_pending_item("pending_popular_activities", activity['id'])
+        col1, col2 = st.columns(2)
+        with col1:
+            pop_date = st.date_input("活动日期*")
+        with col2:
+            pop_name = st.text_input("活动名称*")
+        
+        pop_desc = st.text_area("活动简介*", height=100)
+        
+        pop_images = st.file_uploader(
+            "上传活动图片（最多3张）",
+            type=['jpg', 'jpeg', 'png'],
+            accept_multiple_files=True,
+            key="popular_images_new"
+        )
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            submit_and_continue = st.form_submit_button("✅ 添加到待提交", use_container_width=True)
+        with col2:
+            submit_final = st.form_submit_button("💾 添加并立即提交", type="primary", use_container_width=True)
+        
+        if submit_and_continue or submit_final:
+            if pop_name and pop_desc:
+                if pop_images and len(pop_images) > 3:
+                    st.error("❌ 最多只能上传3张图片")
+                else:
+                    if submit_and_continue:
+                        # 只有暂存到待提交时才需要base64编码，立即提交直接上传原始字节
+                        image_data_list = images_to_data_list(pop_images)
+                        pending_data = {
+                            "unit_name": unit_name,
+                            "activity_date": str(pop_date),
+                            "activity_name": pop_name,
+                            "description": pop_desc,
+                            "image_data": json_dumps(image_data_list) if image_data_list else None
+                        }
+                        success, result = save_pending_item("pending_popular_activities", pending_data)
                         if success:
-                            st.success("删除成功！")
-                            st.rerun()
-            
-            col1, col2 = st.columns([3, 1])
-            with col2:
-                if st.button("💾 提交全部待提交内容", key="submit_all_pending_popular", type="primary", use_container_width=True):
-                    with st.spinner("正在提交数据..."):
-                        success_count, failed_items = submit_pending_activities(
-                            pending_popular,
-                            unit_name,
-                            'popular',
-                            'popular_activities',
-                            'pending_popular_activities'
-                        )
-                        
-                        if success_count == len(pending_popular):
-                            st.success(f"✅ 成功提交{success_count}条科普活动记录！")
+                            st.success(f"✅ 已添加到待提交：{pop_name}")
+                            st.info("💡 请点击上方【提交全部待提交内容】按钮完成提交")
                             st.rerun()
-                        elif success_count > 0:
-                            st.warning(f"⚠️ 成功提交{success_count}条，失败{len(failed_items)}条")
                         else:
-                            st.error(f"❌ 提交失败，请检查数据或联系管理员")
-            
-            st.markdown("---")
-        
-        with st.form(key="popular_form_new"):
-            st.markdown("### ➕ 添加科普活动")
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                pop_date = st.date_input("活动日期*")
-            with col2:
-                pop_name = st.text_input("活动名称*")
-            
-            pop_desc = st.text_area("活动简介*", height=100)
-            
-            pop_images = st.file_uploader(
-                "上传活动图片（最多3张）",
-                type=['jpg', 'jpeg', 'png'],
-                accept_multiple_files=True,
-                key="popular_images_new"
-            )
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                submit_and_continue = st.form_submit_button("✅ 添加到待提交", use_container_width=True)
-            with col2:
-                submit_final = st.form_submit_button("💾 添加并立即提交", type="primary", use_container_width=True)
-            
-            if submit_and_continue or submit_final:
-                if pop_name and pop_desc:
-                    if pop_images and len(pop_images) > 3:
-                        st.error("❌ 最多只能上传3张图片")
-                    else:
-                        image_data_list = []
-                        if pop_images:
-                            for img in pop_images:
-                                b64_data = file_to_base64(img)
-                                if b64_data:
-                                    image_data_list.append({
-                                        'name': img.name,
-                                        'type': img.type,
-                                        'data': b64_data
-                                    })
-                        
-                        if submit_and_continue:
-                            pending_data = {
-                                "unit_name": unit_name,
-                                "activity_date": str(pop_date),
-                                "activity_name": pop_name,
-                                "description": pop_desc,
-                                "image_data": json.dumps(image_data_list) if image_data_list else None
-                            }
-                            success, result = save_pending_item("pending_popular_activities", pending_data)
-                            if success:
-                                st.success(f"✅ 已添加到待提交：{pop_name}")
-                                st.info("💡 请点击上方【提交全部待提交内容】按钮完成提交")
-                                st.rerun()
+                            st.error(f"❌ 保存失败: {result}")
+                    
+                    elif submit_final:
+                        with st.spinner("正在上传数据..."):
+                            upload_ok, image_urls = True, []
+                            if pop_images:
+                                safe_activity_name = sanitize_path(pop_name[:30])
+                                folder = f"{get_unit_safe_name(unit_name)}/popular/{safe_activity_name}"
+                                upload_ok, image_urls = upload_images(folder, pop_images)
+                            
+                            # 有图片上传失败时不写入记录，避免提交缺图的数据
+                            if not upload_ok:
+                                st.error(f"❌ 图片上传失败，记录未提交，请重试: {image_urls}")
                             else:
-                                st.error(f"❌ 保存失败: {result}")
-                        
-                        elif submit_final:
-                            with st.spinner("正在上传数据..."):
-                                image_urls = []
-                                safe_unit_folder = get_unit_safe_name(unit_name)
-                                
-                                if pop_images:
-                                    for img_idx, img in enumerate(pop_images):
-                                        safe_filename = generate_safe_filename(img.name, prefix=f"popular_{img_idx}")
-                                        safe_activity_name = sanitize_path(pop_name[:30])
-                                        file_path = f"{safe_unit_folder}/popular/{safe_activity_name}/{safe_filename}"
-                                        
-                                        success, result = upload_file_to_storage(
-                                            img.getvalue(),
-                                            img.type,
-                                            "images",
-                                            file_path
-                                        )
-                                        if success:
-                                            image_urls.append(result)
-                                
                                 data = {
                                     "unit_name": unit_name,
                                     "activity_date": str(pop_date),
                                     "activity_name": pop_name,
                                     "description": pop_desc,
-                                    "image_urls": json.dumps(image_urls),
+                                    "image_urls": json_dumps(image_urls),
                                     "created_at": datetime.now().isoformat()
                                 }
                                 success, result = save_to_supabase("popular_activities", data)
@@ -833,178 +1068,143 @@ def main():
                                     st.rerun()
                                 else:
                                     st.error(f"❌ 提交失败: {result}")
-                else:
-                    st.error("❌ 请填写所有必填项（标有*）")
+            else:
+                st.error("❌ 请填写所有必填项（标有*）")
+
+
+# ========== 技能竞赛 ==========
+@st.fragment
+def render_competition_tab(unit_name):
+    """技能竞赛标签页（局部刷新：本页内的操作只重跑本标签页）"""
+    st.subheader("技能竞赛登记")
     
-    # ========== 技能竞赛 ==========
-    with tabs[3]:
-        st.subheader("技能竞赛登记")
+    submitted_comps = load_activities("competitions", unit_name)
+    
+    if submitted_comps:
+        st.success(f"✅ 您已提交 {len(submitted_comps)} 条技能竞赛")
+        with st.expander("📋 查看已提交的技能竞赛", expanded=False):
+            submitted_records_table("competitions", submitted_comps, COMPETITION_TABLE_COLUMNS)
+    
+    pending_comps = load_pending_data("pending_competitions", unit_name)
+    
+    if pending_comps:
+        st.markdown("### 📝 待提交的技能竞赛")
+        st.warning(f"⏳ 您有 {len(pending_comps)} 条待提交的技能竞赛")
         
-        submitted_comps = load_activities("competitions", unit_name)
+        for idx, comp in enumerate(pending_comps):
+            with st.expander(f"⏳ {idx+1}. {comp['competition_name']} - {comp['competition_date']}", expanded=False):
+                st.write(f"**竞赛日期：** {comp['competition_date']}")
+                st.write(f"**竞赛名称：** {comp['competition_name']}")
+                st.write(f"**竞赛简介：** {comp['description']}")
+                
+                if comp.get('image_data'):
+                    try:
+                        image_info = json_loads(comp['image_data'])
+                        if image_info:
+                            st.write(f"**竞赛图片：** {len(image_info)}张")
+                            cols = st.columns(min(len(image_info), 3))
+                            for img_idx, img_data in enumerate(image_info):
+                                with cols[img_idx % 3]:
+                                    try:
+                                        # 优先显示缩略图，早期暂存的记录没有缩略图时显示原图
+                                        img_bytes = base64_to_bytes(img_data.get('thumb') or img_data['data'])
+                                        if img_bytes:
+                                            st.image(img_bytes, caption=f"图片 {img_idx+1}", use_container_width=True)
+                                    except Exception:
+                                        pass
+                    except Exception:
+                        pass
+                
+                if st.button(f"🗑️ 删除此条", key=f"del_pending_comp_{comp['id']}"):
+                    success, _ = delete_pending_item("pending_competitions", comp['id'])
+                    if success:
+                        st.success("删除成功！")
+                        st.rerun()
         
-        if submitted_comps:
-            st.success(f"✅ 您已提交 {len(submitted_comps)} 条技能竞赛")
-            with st.expander("📋 查看已提交的技能竞赛", expanded=False):
-                for idx, comp in enumerate(submitted_comps, 1):
-                    st.markdown(f"### {idx}. {comp['competition_name']} ({comp['competition_date']})")
-                    st.write(f"**简介：** {comp['description']}")
-                    
-                    image_urls = json.loads(comp.get('image_urls', '[]'))
-                    if image_urls:
-                        st.write(f"**图片：** {len(image_urls)}张")
-                        cols = st.columns(min(len(image_urls), 3))
-                        for img_idx, img_url in enumerate(image_urls):
-                            with cols[img_idx % 3]:
-                                try:
-                                    st.image(img_url, use_container_width=True)
-                                except:
-                                    st.markdown(f"[🖼️ 查看图片]({img_url})")
+        col1, col2 = st.columns([3, 1])
+        with col2:
+            if st.button("💾 提交全部待提交内容", key="submit_all_pending_comps", type="primary", use_container_width=True):
+                with st.spinner("正在提交数据..."):
+                    success_count, failed_items = submit_pending_activities(
+                        pending_comps,
+                        unit_name,
+                        'competition',
+                        'competitions',
+                        'pending_competitions'
+                    )
                     
-                    if st.button(f"🗑️ 删除此条记录", key=f"del_submitted_comp_{comp['id']}"):
-                        success, _ = delete_from_supabase("competitions", comp['id'])
-                        if success:
-                            st.success("删除成功！")
-                            st.rerun()
-                        else:
-                            st.error("删除失败，请重试")
-                    st.markdown("---")
+                    if success_count == len(pending_comps):
+                        st.success(f"✅ 成功提交{success_count}条技能竞赛记录！")
+                        st.rerun()
+                    elif success_count > 0:
+                        st.warning(f"⚠️ 成功提交{success_count}条，失败{len(failed_items)}条")
+                    else:
+                        st.error(f"❌ 提交失败，请检查数据或联系管理员")
         
-        pending_comps = load_pending_data("pending_competitions", unit_name)
+        st.markdown("---")
+    
+    with st.form(key="comp_form_new"):
+        st.markdown("### ➕ 添加技能竞赛")
         
-        if pending_comps:
-            st.markdown("### 📝 待提交的技能竞赛")
-            st.warning(f"⏳ 您有 {len(pending_comps)} 条待提交的技能竞赛")
-            
-            for idx, comp in enumerate(pending_comps):
-                with st.expander(f"⏳ {idx+1}. {comp['competition_name']} - {comp['competition_date']}", expanded=False):
-                    st.write(f"**竞赛日期：** {comp['competition_date']}")
-                    st.write(f"**竞赛名称：** {comp['competition_name']}")
-                    st.write(f"**竞赛简介：** {comp['description']}")
-                    
-                    if comp.get('image_data'):
-                        try:
-                            image_info = json.loads(comp['image_data'])
-                            if image_info:
-                                st.write(f"**竞赛图片：** {len(image_info)}张")
-                                cols = st.columns(min(len(image_info), 3))
-                                for img_idx, img_data in enumerate(image_info):
-                                    with cols[img_idx % 3]:
-                                        try:
-                                            img_bytes = base64_to_bytes(img_data['data'])
-                                            if img_bytes:
-                                                st.image(img_bytes, caption=f"图片 {img_idx+1}", use_container_width=True)
-                                        except:
-                                            pass
-                        except:
-                            pass
-                    
-                    if st.button(f"🗑️ 删除此条", key=f"del_pending_comp_{comp['id']}"):
-                        success, _ = delete_pending_item("pending_competitions", comp['id'])
-                        if success:
-                            st.success("删除成功！")
-                            st.rerun()
-            
-            col1, col2 = st.columns([3, 1])
-            with col2:
-                if st.button("💾 提交全部待提交内容", key="submit_all_pending_comps", type="primary", use_container_width=True):
-                    with st.spinner("正在提交数据..."):
-                        success_count, failed_items = submit_pending_activities(
-                            pending_comps,
-                            unit_name,
-                            'competition',
-                            'competitions',
-                            'pending_competitions'
-                        )
-                        
-                        if success_count == len(pending_comps):
-                            st.success(f"✅ 成功提交{success_count}条技能竞赛记录！")
-                            st.rerun()
-                        elif success_count > 0:
-                            st.warning(f"⚠️ 成功提交{success_count}条，失败{len(failed_items)}条")
-                        else:
-                            st.error(f"❌ 提交失败，请检查数据或联系管理员")
-            
-            st.markdown("---")
+        col1, col2 = st.columns(2)
+        with col1:
+            comp_date = st.date_input("竞赛日期*")
+        with col2:
+            comp_name = st.text_input("竞赛名称*")
         
-        with st.form(key="comp_form_new"):
-            st.markdown("### ➕ 添加技能竞赛")
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                comp_date = st.date_input("竞赛日期*")
-            with col2:
-                comp_name = st.text_input("竞赛名称*")
-            
-            comp_desc = st.text_area("竞赛简介*", height=100)
-            
-            comp_images = st.file_uploader(
-                "上传竞赛图片",
-                type=['jpg', 'jpeg', 'png'],
-                accept_multiple_files=True,
-                key="comp_images_new"
-            )
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                submit_and_continue = st.form_submit_button("✅ 添加到待提交", use_container_width=True)
-            with col2:
-                submit_final = st.form_submit_button("💾 添加并立即提交", type="primary", use_container_width=True)
-            
-            if submit_and_continue or submit_final:
-                if comp_name and comp_desc:
-                    image_data_list = []
-                    if comp_images:
-                        for img in comp_images:
-                            b64_data = file_to_base64(img)
-                            if b64_data:
-                                image_data_list.append({
-                                    'name': img.name,
-                                    'type': img.type,
-                                    'data': b64_data
-                                })
-                    
-                    if submit_and_continue:
-                        pending_data = {
-                            "unit_name": unit_name,
-                            "competition_date": str(comp_date),
-                            "competition_name": comp_name,
-                            "description": comp_desc,
-                            "image_data": json.dumps(image_data_list) if image_data_list else None
-                        }
-                        success, result = save_pending_item("pending_competitions", pending_data)
-                        if success:
-                            st.success(f"✅ 已添加到待提交：{comp_name}")
-                            st.info("💡 请点击上方【提交全部待提交内容】按钮完成提交")
-                            st.rerun()
+        comp_desc = st.text_area("竞赛简介*", height=100)
+        
+        comp_images = st.file_uploader(
+            "上传竞赛图片",
+            type=['jpg', 'jpeg', 'png'],
+            accept_multiple_files=True,
+            key="comp_images_new"
+        )
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            submit_and_continue = st.form_submit_button("✅ 添加到待提交", use_container_width=True)
+        with col2:
+            submit_final = st.form_submit_button("💾 添加并立即提交", type="primary", use_container_width=True)
+        
+        if submit_and_continue or submit_final:
+            if comp_name and comp_desc:
+                if submit_and_continue:
+                    # 只有暂存到待提交时才需要base64编码，立即提交直接上传原始字节
+                    image_data_list = images_to_data_list(comp_images)
+                    pending_data = {
+                        "unit_name": unit_name,
+                        "competition_date": str(comp_date),
+                        "competition_name": comp_name,
+                        "description": comp_desc,
+                        "image_data": json_dumps(image_data_list) if image_data_list else None
+                    }
+                    success, result = save_pending_item("pending_competitions", pending_data)
+                    if success:
+                        st.success(f"✅ 已添加到待提交：{comp_name}")
+                        st.info("💡 请点击上方【提交全部待提交内容】按钮完成提交")
+                        st.rerun()
+                    else:
+                        st.error(f"❌ 保存失败: {result}")
+                
+                elif submit_final:
+                    with st.spinner("正在上传数据..."):
+                        upload_ok, image_urls = True, []
+                        if comp_images:
+                            safe_comp_name = sanitize_path(comp_name[:30])
+                            folder = f"{get_unit_safe_name(unit_name)}/competition/{safe_comp_name}"
+                            upload_ok, image_urls = upload_images(folder, comp_images)
+                        
+                        # 有图片上传失败时不写入记录，避免提交缺图的数据
+                        if not upload_ok:
+                            st.error(f"❌ 图片上传失败，记录未提交，请重试: {image_urls}")
                         else:
-                            st.error(f"❌ 保存失败: {result}")
-                    
-                    elif submit_final:
-                        with st.spinner("正在上传数据..."):
-                            image_urls = []
-                            safe_unit_folder = get_unit_safe_name(unit_name)
-                            
-                            if comp_images:
-                                for img_idx, img in enumerate(comp_images):
-                                    safe_filename = generate_safe_filename(img.name, prefix=f"comp_{img_idx}")
-                                    safe_comp_name = sanitize_path(comp_name[:30])
-                                    file_path = f"{safe_unit_folder}/competition/{safe_comp_name}/{safe_filename}"
-                                    
-                                    success, result = upload_file_to_storage(
-                                        img.getvalue(),
-                                        img.type,
-                                        "images",
-                                        file_path
-                                    )
-                                    if success:
-                                        image_urls.append(result)
-                            
                             data = {
                                 "unit_name": unit_name,
                                 "competition_date": str(comp_date),
                                 "competition_name": comp_name,
                                 "description": comp_desc,
-                                "image_urls": json.dumps(image_urls),
+                                "image_urls": json_dumps(image_urls),
                                 "created_at": datetime.now().isoformat()
                             }
                             success, result = save_to_supabase("competitions", data)
@@ -1013,177 +1213,142 @@ def main():
                                 st.rerun()
                             else:
                                 st.error(f"❌ 提交失败: {result}")
-                else:
-                    st.error("❌ 请填写所有必填项（标有*）")
+            else:
+                st.error("❌ 请填写所有必填项（标有*）")
+
+
+# ========== 获奖情况 ==========
+@st.fragment
+def render_award_tab(unit_name):
+    """获奖情况标签页（局部刷新：本页内的操作只重跑本标签页）"""
+    st.subheader("获奖情况登记")
     
-    # ========== 获奖情况 ==========
-    with tabs[4]:
-        st.subheader("获奖情况登记")
+    submitted_awards = load_activities("awards", unit_name)
+    
+    if submitted_awards:
+        st.success(f"✅ 您已提交 {len(submitted_awards)} 条获奖记录")
+        with st.expander("📋 查看已提交的获奖情况", expanded=False):
+            submitted_records_table("awards", submitted_awards, AWARD_TABLE_COLUMNS)
+    
+    pending_awards = load_pending_data("pending_awards", unit_name)
+    
+    if pending_awards:
+        st.markdown("### 📝 待提交的获奖记录")
+        st.warning(f"⏳ 您有 {len(pending_awards)} 条待提交的获奖记录")
         
-        submitted_awards = load_activities("awards", unit_name)
+        for idx, award in enumerate(pending_awards):
+            with st.expander(f"⏳ {idx+1}. {award['award_name']} - {award['award_date']}", expanded=False):
+                st.write(f"**获奖日期：** {award['award_date']}")
+                st.write(f"**奖项名称：** {award['award_name']}")
+                st.write(f"**颁奖单位：** {award['award_organization']}")
+                
+                if award.get('image_data'):
+                    try:
+                        image_info = json_loads(award['image_data'])
+                        if image_info:
+                            st.write(f"**获奖图片：** {len(image_info)}张")
+                            cols = st.columns(min(len(image_info), 3))
+                            for img_idx, img_data in enumerate(image_info):
+                                with cols[img_idx % 3]:
+                                    try:
+                                        # 优先显示缩略图，早期暂存的记录没有缩略图时显示原图
+                                        img_bytes = base64_to_bytes(img_data.get('thumb') or img_data['data'])
+                                        if img_bytes:
+                                            st.image(img_bytes, caption=f"图片 {img_idx+1}", use_container_width=True)
+                                    except Exception:
+                                        pass
+                    except Exception:
+                        pass
+                
+                if st.button(f"🗑️ 删除此条", key=f"del_pending_award_{award['id']}"):
+                    success, _ = delete_pending_item("pending_awards", award['id'])
+                    if success:
+                        st.success("删除成功！")
+                        st.rerun()
         
-        if submitted_awards:
-            st.success(f"✅ 您已提交 {len(submitted_awards)} 条获奖记录")
-            with st.expander("📋 查看已提交的获奖情况", expanded=False):
-                for idx, award in enumerate(submitted_awards, 1):
-                    st.markdown(f"### {idx}. {award['award_name']} ({award['award_date']})")
-                    st.write(f"**颁奖单位：** {award.get('award_organization', '未填写')}")
-                    
-                    image_urls = json.loads(award.get('image_urls', '[]'))
-                    if image_urls:
-                        st.write(f"**图片：** {len(image_urls)}张")
-                        cols = st.columns(min(len(image_urls), 3))
-                        for img_idx, img_url in enumerate(image_urls):
-                            with cols[img_idx % 3]:
-                                try:
-                                    st.image(img_url, use_container_width=True)
-                                except:
-                                    st.markdown(f"[🖼️ 查看图片]({img_url})")
+        col1, col2 = st.columns([3, 1])
+        with col2:
+            if st.button("💾 提交全部待提交内容", key="submit_all_pending_awards", type="primary", use_container_width=True):
+                with st.spinner("正在提交数据..."):
+                    success_count, failed_items = submit_pending_activities(
+                        pending_awards,
+                        unit_name,
+                        'award',
+                        'awards',
+                        'pending_awards'
+                    )
                     
-                    if st.button(f"🗑️ 删除此条记录", key=f"del_submitted_award_{award['id']}"):
-                        success, _ = delete_from_supabase("awards", award['id'])
-                        if success:
-                            st.success("删除成功！")
-                            st.rerun()
-                        else:
-                            st.error("删除失败，请重试")
-                    st.markdown("---")
+                    if success_count == len(pending_awards):
+                        st.success(f"✅ 成功提交{success_count}条获奖记录！")
+                        st.rerun()
+                    elif success_count > 0:
+                        st.warning(f"⚠️ 成功提交{success_count}条，失败{len(failed_items)}条")
+                    else:
+                        st.error(f"❌ 提交失败，请检查数据或联系管理员")
         
-        pending_awards = load_pending_data("pending_awards", unit_name)
+        st.markdown("---")
+    
+    with st.form(key="award_form_new"):
+        st.markdown("### ➕ 添加获奖记录")
         
-        if pending_awards:
-            st.markdown("### 📝 待提交的获奖记录")
-            st.warning(f"⏳ 您有 {len(pending_awards)} 条待提交的获奖记录")
-            
-            for idx, award in enumerate(pending_awards):
-                with st.expander(f"⏳ {idx+1}. {award['award_name']} - {award['award_date']}", expanded=False):
-                    st.write(f"**获奖日期：** {award['award_date']}")
-                    st.write(f"**奖项名称：** {award['award_name']}")
-                    st.write(f"**颁奖单位：** {award['award_organization']}")
-                    
-                    if award.get('image_data'):
-                        try:
-                            image_info = json.loads(award['image_data'])
-                            if image_info:
-                                st.write(f"**获奖图片：** {len(image_info)}张")
-                                cols = st.columns(min(len(image_info), 3))
-                                for img_idx, img_data in enumerate(image_info):
-                                    with cols[img_idx % 3]:
-                                        try:
-                                            img_bytes = base64_to_bytes(img_data['data'])
-                                            if img_bytes:
-                                                st.image(img_bytes, caption=f"图片 {img_idx+1}", use_container_width=True)
-                                        except:
-                                            pass
-                        except:
-                            pass
-                    
-                    if st.button(f"🗑️ 删除此条", key=f"del_pending_award_{award['id']}"):
-                        success, _ = delete_pending_item("pending_awards", award['id'])
-                        if success:
-                            st.success("删除成功！")
-                            st.rerun()
-            
-            col1, col2 = st.columns([3, 1])
-            with col2:
-                if st.button("💾 提交全部待提交内容", key="submit_all_pending_awards", type="primary", use_container_width=True):
-                    with st.spinner("正在提交数据..."):
-                        success_count, failed_items = submit_pending_activities(
-                            pending_awards,
-                            unit_name,
-                            'award',
-                            'awards',
-                            'pending_awards'
-                        )
-                        
-                        if success_count == len(pending_awards):
-                            st.success(f"✅ 成功提交{success_count}条获奖记录！")
-                            st.rerun()
-                        elif success_count > 0:
-                            st.warning(f"⚠️ 成功提交{success_count}条，失败{len(failed_items)}条")
-                        else:
-                            st.error(f"❌ 提交失败，请检查数据或联系管理员")
-            
-            st.markdown("---")
+        col1, col2 = st.columns(2)
+        with col1:
+            award_date = st.date_input("获奖日期*")
+            award_name = st.text_input("奖项名称*")
+        with col2:
+            award_organization = st.text_input("颁奖单位*", placeholder="例如：揭阳市卫生健康局")
         
-        with st.form(key="award_form_new"):
-            st.markdown("### ➕ 添加获奖记录")
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                award_date = st.date_input("获奖日期*")
-                award_name = st.text_input("奖项名称*")
-            with col2:
-                award_organization = st.text_input("颁奖单位*", placeholder="例如：揭阳市卫生健康局")
-            
-            award_images = st.file_uploader(
-                "上传获奖图片",
-                type=['jpg', 'jpeg', 'png'],
-                accept_multiple_files=True,
-                key="award_images_new"
-            )
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                submit_and_continue = st.form_submit_button("✅ 添加到待提交", use_container_width=True)
-            with col2:
-                submit_final = st.form_submit_button("💾 添加并立即提交", type="primary", use_container_width=True)
-            
-            if submit_and_continue or submit_final:
-                if award_name and award_organization:
-                    image_data_list = []
-                    if award_images:
-                        for img in award_images:
-                            b64_data = file_to_base64(img)
-                            if b64_data:
-                                image_data_list.append({
-                                    'name': img.name,
-                                    'type': img.type,
-                                    'data': b64_data
-                                })
-                    
-                    if submit_and_continue:
-                        pending_data = {
-                            "unit_name": unit_name,
-                            "award_date": str(award_date),
-                            "award_name": award_name,
-                            "award_organization": award_organization,
-                            "image_data": json.dumps(image_data_list) if image_data_list else None
-                        }
-                        success, result = save_pending_item("pending_awards", pending_data)
-                        if success:
-                            st.success(f"✅ 已添加到待提交：{award_name}")
-                            st.info("💡 请点击上方【提交全部待提交内容】按钮完成提交")
-                            st.rerun()
+        award_images = st.file_uploader(
+            "上传获奖图片",
+            type=['jpg', 'jpeg', 'png'],
+            accept_multiple_files=True,
+            key="award_images_new"
+        )
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            submit_and_continue = st.form_submit_button("✅ 添加到待提交", use_container_width=True)
+        with col2:
+            submit_final = st.form_submit_button("💾 添加并立即提交", type="primary", use_container_width=True)
+        
+        if submit_and_continue or submit_final:
+            if award_name and award_organization:
+                if submit_and_continue:
+                    # 只有暂存到待提交时才需要base64编码，立即提交直接上传原始字节
+                    image_data_list = images_to_data_list(award_images)
+                    pending_data = {
+                        "unit_name": unit_name,
+                        "award_date": str(award_date),
+                        "award_name": award_name,
+                        "award_organization": award_organization,
+                        "image_data": json_dumps(image_data_list) if image_data_list else None
+                    }
+                    success, result = save_pending_item("pending_awards", pending_data)
+                    if success:
+                        st.success(f"✅ 已添加到待提交：{award_name}")
+                        st.info("💡 请点击上方【提交全部待提交内容】按钮完成提交")
+                        st.rerun()
+                    else:
+                        st.error(f"❌ 保存失败: {result}")
+                
+                elif submit_final:
+                    with st.spinner("正在上传数据..."):
+                        upload_ok, image_urls = True, []
+                        if award_images:
+                            safe_award_name = sanitize_path(award_name[:30])
+                            folder = f"{get_unit_safe_name(unit_name)}/award/{safe_award_name}"
+                            upload_ok, image_urls = upload_images(folder, award_images)
+                        
+                        # 有图片上传失败时不写入记录，避免提交缺图的数据
+                        if not upload_ok:
+                            st.error(f"❌ 图片上传失败，记录未提交，请重试: {image_urls}")
                         else:
-                            st.error(f"❌ 保存失败: {result}")
-                    
-                    elif submit_final:
-                        with st.spinner("正在上传数据..."):
-                            image_urls = []
-                            safe_unit_folder = get_unit_safe_name(unit_name)
-                            
-                            if award_images:
-                                for img_idx, img in enumerate(award_images):
-                                    safe_filename = generate_safe_filename(img.name, prefix=f"award_{img_idx}")
-                                    safe_award_name = sanitize_path(award_name[:30])
-                                    file_path = f"{safe_unit_folder}/award/{safe_award_name}/{safe_filename}"
-                                    
-                                    success, result = upload_file_to_storage(
-                                        img.getvalue(),
-                                        img.type,
-                                        "images",
-                                        file_path
-                                    )
-                                    if success:
-                                        image_urls.append(result)
-                            
                             data = {
                                 "unit_name": unit_name,
                                 "award_date": str(award_date),
                                 "award_name": award_name,
                                 "award_organization": award_organization,
-                                "image_urls": json.dumps(image_urls),
+                                "image_urls": json_dumps(image_urls),
                                 "created_at": datetime.now().isoformat()
                             }
                             success, result = save_to_supabase("awards", data)
@@ -1192,135 +1357,119 @@ def main():
                                 st.rerun()
                             else:
                                 st.error(f"❌ 提交失败: {result}")
-                else:
-                    st.error("❌ 请填写所有必填项（奖项名称和颁奖单位）")
+            else:
+                st.error("❌ 请填写所有必填项（奖项名称和颁奖单位）")
+
+
+# ========== 科研立项 ==========
+@st.fragment
+def render_project_tab(unit_name):
+    """科研立项标签页（局部刷新：本页内的操作只重跑本标签页）"""
+    st.subheader("科研立项登记")
     
-    # ========== 科研立项 ==========
-    with tabs[5]:
-        st.subheader("科研立项登记")
+    submitted_projects = load_activities("research_projects", unit_name)
+    
+    if submitted_projects:
+        st.success(f"✅ 您已提交 {len(submitted_projects)} 条科研立项")
+        with st.expander("📋 查看已提交的科研立项", expanded=False):
+            submitted_records_table("research_projects", submitted_projects, PROJECT_TABLE_COLUMNS)
+    
+    pending_projects = load_pending_data("pending_research_projects", unit_name)
+    
+    if pending_projects:
+        st.markdown("### 📝 待提交的科研立项")
+        st.warning(f"⏳ 您有 {len(pending_projects)} 条待提交的科研立项")
         
-        submitted_projects = load_activities("research_projects", unit_name)
+        st.dataframe(records_to_table(pending_projects, PROJECT_TABLE_COLUMNS), use_container_width=True, hide_index=True)
         
-        if submitted_projects:
-            st.success(f"✅ 您已提交 {len(submitted_projects)} 条科研立项")
-            with st.expander("📋 查看已提交的科研立项", expanded=False):
-                df_data = []
-                for proj in submitted_projects:
-                    df_data.append({
-                        'ID': proj['id'],
-                        '项目负责人': proj['project_leader'],
-                        '项目名称': proj['project_name'],
-                        '立项单位': proj['project_unit'],
-                        '基金名称': proj['fund_name'],
-                        '编号': proj['fund_number'],
-                        '资助金额（万元）': proj['fund_amount'],
-                        '立项时间': proj['project_date']
-                    })
-                df = pd.DataFrame(df_data)
-                st.dataframe(df.drop('ID', axis=1), use_container_width=True, hide_index=True)
-                
-                for proj in submitted_projects:
-                    col1, col2 = st.columns([8, 2])
-                    with col1:
-                        st.write(f"**{proj['project_name']}** - {proj['project_leader']}")
-                    with col2:
-                        if st.button(f"🗑️ 删除", key=f"del_submitted_proj_{proj['id']}"):
-                            success, _ = delete_from_supabase("research_projects", proj['id'])
-                            if success:
-                                st.success("删除成功！")
-                                st.rerun()
-                            else:
-                                st.error("删除失败，请重试")
+        for idx, proj in enumerate(pending_projects):
+            col1, col2 = st.columns([8, 2])
+            with col1:
+                st.write(f"{idx+1}. {proj['project_name']}")
+            with col2:
+                if st.button(f"🗑️ 删除", key=f"del_pending_proj_{proj['id']}"):
+                    success, _ = delete_pending_item("pending_research_projects", proj['id'])
+                    if success:
+                        st.success("删除成功！")
+                        st.rerun()
         
-        pending_projects = load_pending_data("pending_research_projects", unit_name)
+        col1, col2 = st.columns([3, 1])
+        with col2:
+            if st.button("💾 提交全部待提交内容", key="submit_all_pending_projects", type="primary", use_container_width=True):
+                with st.spinner("正在保存数据..."):
+                    created_at = datetime.now().isoformat()
+                    rows = []
+                    for proj in pending_projects:
+                        rows.append({
+                            "unit_name": unit_name,
+                            "project_leader": proj['project_leader'],
+                            "project_name": proj['project_name'],
+                            "project_unit": proj['project_unit'],
+                            "fund_name": proj['fund_name'],
+                            "fund_number": proj['fund_number'],
+                            "fund_amount": proj['fund_amount'],
+                            "project_date": proj['project_date'],
+                            "created_at": created_at
+                        })
+                    
+                    saved = commit_pending_rows("research_projects", "pending_research_projects", rows, pending_projects)
+                    success_count = len(saved)
+                    
+                    if success_count == len(pending_projects):
+                        st.success(f"✅ 成功提交{success_count}条科研立项记录！")
+                        st.rerun()
+                    else:
+                        st.warning(f"⚠️ 成功提交{success_count}条")
         
-        if pending_projects:
-            st.markdown("### 📝 待提交的科研立项")
-            st.warning(f"⏳ 您有 {len(pending_projects)} 条待提交的科研立项")
-            
-            df_data = []
-            for proj in pending_projects:
-                df_data.append({
-                    'ID': proj['id'],
-                    '项目负责人': proj['project_leader'],
-                    '项目名称': proj['project_name'],
-                    '立项单位': proj['project_unit'],
-                    '基金名称': proj['fund_name'],
-                    '编号': proj['fund_number'],
-                    '资助金额（万元）': proj['fund_amount'],
-                    '立项时间': proj['project_date']
-                })
-            df = pd.DataFrame(df_data)
-            st.dataframe(df.drop('ID', axis=1), use_container_width=True, hide_index=True)
-            
-            for idx, proj in enumerate(pending_projects):
-                col1, col2 = st.columns([8, 2])
-                with col1:
-                    st.write(f"{idx+1}. {proj['project_name']}")
-                with col2:
-                    if st.button(f"🗑️ 删除", key=f"del_pending_proj_{proj['id']}"):
-                        success, _ = delete_pending_item("pending_research_projects", proj['id'])
-                        if success:
-                            st.success("删除成功！")
-                            st.rerun()
-            
-            col1, col2 = st.columns([3, 1])
-            with col2:
-                if st.button("💾 提交全部待提交内容", key="submit_all_pending_projects", type="primary", use_container_width=True):
-                    with st.spinner("正在保存数据..."):
-                        success_count = 0
-                        for proj in pending_projects:
-                            data = {
-                                "unit_name": unit_name,
-                                "project_leader": proj['project_leader'],
-                                "project_name": proj['project_name'],
-                                "project_unit": proj['project_unit'],
-                                "fund_name": proj['fund_name'],
-                                "fund_number": proj['fund_number'],
-                                "fund_amount": proj['fund_amount'],
-                                "project_date": proj['project_date'],
-                                "created_at": datetime.now().isoformat()
-                            }
-                            success, result = save_to_supabase("research_projects", data)
-                            if success:
-                                success_count += 1
-                                delete_pending_item("pending_research_projects", proj['id'])
-                        
-                        if success_count == len(pending_projects):
-                            st.success(f"✅ 成功提交{success_count}条科研立项记录！")
-                            st.rerun()
-                        else:
-                            st.warning(f"⚠️ 成功提交{success_count}条")
-            
-            st.markdown("---")
+        st.markdown("---")
+    
+    with st.form(key="project_form_new"):
+        st.markdown("### ➕ 添加科研立项")
+        st.info("⚠️ 除资助金额外，其他字段均为必填项")
         
-        with st.form(key="project_form_new"):
-            st.markdown("### ➕ 添加科研立项")
-            st.info("⚠️ 除资助金额外，其他字段均为必填项")
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                project_leader = st.text_input("项目负责人*")
-                project_name = st.text_input("项目名称*")
-                project_unit = st.text_input("立项单位*", value=unit_name)
-            
-            with col2:
-                fund_name = st.text_input("基金名称*")
-                fund_number = st.text_input("编号*")
-                fund_amount = st.number_input("资助金额（万元）", min_value=0.0, step=0.1, value=0.0)
-            
-            project_date = st.date_input("立项时间*")
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                submit_and_continue = st.form_submit_button("✅ 添加到待提交", use_container_width=True)
-            with col2:
-                submit_final = st.form_submit_button("💾 添加并立即提交", type="primary", use_container_width=True)
-            
-            if submit_and_continue or submit_final:
-                if project_leader and project_name and project_unit and fund_name and fund_number:
-                    if submit_and_continue:
-                        pending_data = {
+        col1, col2 = st.columns(2)
+        with col1:
+            project_leader = st.text_input("项目负责人*")
+            project_name = st.text_input("项目名称*")
+            project_unit = st.text_input("立项单位*", value=unit_name)
+        
+        with col2:
+            fund_name = st.text_input("基金名称*")
+            fund_number = st.text_input("编号*")
+            fund_amount = st.number_input("资助金额（万元）", min_value=0.0, step=0.1, value=0.0)
+        
+        project_date = st.date_input("立项时间*")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            submit_and_continue = st.form_submit_button("✅ 添加到待提交", use_container_width=True)
+        with col2:
+            submit_final = st.form_submit_button("💾 添加并立即提交", type="primary", use_container_width=True)
+        
+        if submit_and_continue or submit_final:
+            if project_leader and project_name and project_unit and fund_name and fund_number:
+                if submit_and_continue:
+                    pending_data = {
+                        "unit_name": unit_name,
+                        "project_leader": project_leader,
+                        "project_name": project_name,
+                        "project_unit": project_unit,
+                        "fund_name": fund_name,
+                        "fund_number": fund_number,
+                        "fund_amount": fund_amount,
+                        "project_date": str(project_date)
+                    }
+                    success, result = save_pending_item("pending_research_projects", pending_data)
+                    if success:
+                        st.success(f"✅ 已添加到待提交：{project_name}")
+                        st.info("💡 请点击上方【提交全部待提交内容】按钮完成提交")
+                        st.rerun()
+                    else:
+                        st.error(f"❌ 保存失败: {result}")
+                
+                elif submit_final:
+                    with st.spinner("正在保存数据..."):
+                        data = {
                             "unit_name": unit_name,
                             "project_leader": project_leader,
                             "project_name": project_name,
@@ -1328,174 +1477,143 @@ def main():
                             "fund_name": fund_name,
                             "fund_number": fund_number,
                             "fund_amount": fund_amount,
-                            "project_date": str(project_date)
+                            "project_date": str(project_date),
+                            "created_at": datetime.now().isoformat()
                         }
-                        success, result = save_pending_item("pending_research_projects", pending_data)
+                        success, result = save_to_supabase("research_projects", data)
                         if success:
-                            st.success(f"✅ 已添加到待提交：{project_name}")
-                            st.info("💡 请点击上方【提交全部待提交内容】按钮完成提交")
+                            st.success(f"✅ 成功提交1条科研立项记录！")
                             st.rerun()
                         else:
-                            st.error(f"❌ 保存失败: {result}")
-                    
-                    elif submit_final:
-                        with st.spinner("正在保存数据..."):
-                            data = {
-                                "unit_name": unit_name,
-                                "project_leader": project_leader,
-                                "project_name": project_name,
-                                "project_unit": project_unit,
-                                "fund_name": fund_name,
-                                "fund_number": fund_number,
-                                "fund_amount": fund_amount,
-                                "project_date": str(project_date),
-                                "created_at": datetime.now().isoformat()
-                            }
-                            success, result = save_to_supabase("research_projects", data)
-                            if success:
-                                st.success(f"✅ 成功提交1条科研立项记录！")
-                                st.rerun()
-                            else:
-                                st.error(f"❌ 提交失败: {result}")
-                else:
-                    st.error("❌ 请填写所有必填项（除资助金额外）")
+                            st.error(f"❌ 提交失败: {result}")
+            else:
+                st.error("❌ 请填写所有必填项（除资助金额外）")
+
+
+# ========== 论文发表 ==========
+@st.fragment
+def render_publication_tab(unit_name):
+    """论文发表标签页（局部刷新：本页内的操作只重跑本标签页）"""
+    st.subheader("论文发表登记")
     
-    # ========== 论文发表 ==========
-    with tabs[6]:
-        st.subheader("论文发表登记")
+    submitted_pubs = load_activities("publications", unit_name)
+    
+    if submitted_pubs:
+        st.success(f"✅ 您已提交 {len(submitted_pubs)} 条论文发表")
+        with st.expander("📋 查看已提交的论文发表", expanded=False):
+            submitted_records_table("publications", submitted_pubs, PUBLICATION_TABLE_COLUMNS)
+    
+    pending_pubs = load_pending_data("pending_publications", unit_name)
+    
+    if pending_pubs:
+        st.markdown("### 📝 待提交的论文发表")
+        st.warning(f"⏳ 您有 {len(pending_pubs)} 条待提交的论文发表")
         
-        submitted_pubs = load_activities("publications", unit_name)
+        st.dataframe(records_to_table(pending_pubs, PUBLICATION_TABLE_COLUMNS), use_container_width=True, hide_index=True)
         
-        if submitted_pubs:
-            st.success(f"✅ 您已提交 {len(submitted_pubs)} 条论文发表")
-            with st.expander("📋 查看已提交的论文发表", expanded=False):
-                df_data = []
-                for pub in submitted_pubs:
-                    df_data.append({
-                        'ID': pub['id'],
-                        '类型': pub['publication_type'],
-                        '题目': pub['title'],
-                        '刊物名称': pub['journal'],
-                        '作者': pub['author'],
-                        '刊物等级': pub['level'],
-                        '发表时间': pub['publication_date']
-                    })
-                df = pd.DataFrame(df_data)
-                st.dataframe(df.drop('ID', axis=1), use_container_width=True, hide_index=True)
-                
-                for pub in submitted_pubs:
-                    col1, col2 = st.columns([8, 2])
-                    with col1:
-                        st.write(f"**{pub['title']}** - {pub['author']}")
-                    with col2:
-                        if st.button(f"🗑️ 删除", key=f"del_submitted_pub_{pub['id']}"):
-                            success, _ = delete_from_supabase("publications", pub['id'])
-                            if success:
-                                st.success("删除成功！")
-                                st.rerun()
-                            else:
-                                st.error("删除失败，请重试")
+        for idx, pub in enumerate(pending_pubs):
+            col1, col2 = st.columns([8, 2])
+            with col1:
+                st.write(f"{idx+1}. {pub['title']}")
+            with col2:
+                if st.button(f"🗑️ 删除", key=f"del_pending_pub_{pub['id']}"):
+                    success, _ = delete_pending_item("pending_publications", pub['id'])
+                    if success:
+                        st.success("删除成功！")
+                        st.rerun()
         
-        pending_pubs = load_pending_data("pending_publications", unit_name)
+        col1, col2 = st.columns([3, 1])
+        with col2:
+            if st.button("💾 提交全部待提交内容", key="submit_all_pending_pubs", type="primary", use_container_width=True):
+                with st.spinner("正在保存数据..."):
+                    created_at = datetime.now().isoformat()
+                    rows = []
+                    for pub in pending_pubs:
+                        rows.append({
+                            "unit_name": unit_name,
+                            "publication_type": pub['publication_type'],
+                            "title": pub['title'],
+                            "journal": pub['journal'],
+                            "cn_number": pub.get('cn_number', ''),
+                            "department": pub.get('department', ''),
+                            "issue": pub.get('issue', ''),
+                            "pages": pub.get('pages', ''),
+                            "author": pub['author'],
+                            "level": pub['level'],
+                            "publication_date": pub['publication_date'],
+                            "created_at": created_at
+                        })
+                    
+                    saved = commit_pending_rows("publications", "pending_publications", rows, pending_pubs)
+                    success_count = len(saved)
+                    
+                    if success_count == len(pending_pubs):
+                        st.success(f"✅ 成功提交{success_count}条论文发表记录！")
+                        st.rerun()
+                    else:
+                        st.warning(f"⚠️ 成功提交{success_count}条")
         
-        if pending_pubs:
-            st.markdown("### 📝 待提交的论文发表")
-            st.warning(f"⏳ 您有 {len(pending_pubs)} 条待提交的论文发表")
-            
-            df_data = []
-            for pub in pending_pubs:
-                df_data.append({
-                    'ID': pub['id'],
-                    '类型': pub['publication_type'],
-                    '题目': pub['title'],
-                    '刊物名称': pub['journal'],
-                    '作者': pub['author'],
-                    '刊物等级': pub['level'],
-                    '发表时间': pub['publication_date']
-                })
-            df = pd.DataFrame(df_data)
-            st.dataframe(df.drop('ID', axis=1), use_container_width=True, hide_index=True)
-            
-            for idx, pub in enumerate(pending_pubs):
-                col1, col2 = st.columns([8, 2])
-                with col1:
-                    st.write(f"{idx+1}. {pub['title']}")
-                with col2:
-                    if st.button(f"🗑️ 删除", key=f"del_pending_pub_{pub['id']}"):
-                        success, _ = delete_pending_item("pending_publications", pub['id'])
-                        if success:
-                            st.success("删除成功！")
-                            st.rerun()
-            
-            col1, col2 = st.columns([3, 1])
-            with col2:
-                if st.button("💾 提交全部待提交内容", key="submit_all_pending_pubs", type="primary", use_container_width=True):
-                    with st.spinner("正在保存数据..."):
-                        success_count = 0
-                        for pub in pending_pubs:
-                            data = {
-                                "unit_name": unit_name,
-                                "publication_type": pub['publication_type'],
-                                "title": pub['title'],
-                                "journal": pub['journal'],
-                                "cn_number": pub.get('cn_number', ''),
-                                "department": pub.get('department', ''),
-                                "issue": pub.get('issue', ''),
-                                "pages": pub.get('pages', ''),
-                                "author": pub['author'],
-                                "level": pub['level'],
-                                "publication_date": pub['publication_date'],
-                                "created_at": datetime.now().isoformat()
-                            }
-                            success, result = save_to_supabase("publications", data)
-                            if success:
-                                success_count += 1
-                                delete_pending_item("pending_publications", pub['id'])
-                        
-                        if success_count == len(pending_pubs):
-                            st.success(f"✅ 成功提交{success_count}条论文发表记录！")
-                            st.rerun()
-                        else:
-                            st.warning(f"⚠️ 成功提交{success_count}条")
-            
-            st.markdown("---")
+        st.markdown("---")
+    
+    with st.form(key="pub_form_new"):
+        st.markdown("### ➕ 添加论文发表")
         
-        with st.form(key="pub_form_new"):
-            st.markdown("### ➕ 添加论文发表")
-            
-            pub_type = st.selectbox(
-                "类型*",
-                ["论文", "专著", "专利"]
+        pub_type = st.selectbox(
+            "类型*",
+            ["论文", "专著", "专利"]
+        )
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            pub_title = st.text_input("论文/专著/专利题目*")
+            pub_journal = st.text_input("刊物/专著名称*")
+            pub_cn = st.text_input("刊物CN号/出版社名称")
+            pub_department = st.text_input("刊物主管部门")
+        
+        with col2:
+            pub_issue = st.text_input("期刊、卷期")
+            pub_pages = st.text_input("页码")
+            pub_author = st.text_input("第一作者/通讯作者*")
+            pub_level = st.selectbox(
+                "刊物等级*",
+                ["", "SCI", "中文核心期刊", "科技核心", "省级期刊", "其他"]
             )
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                pub_title = st.text_input("论文/专著/专利题目*")
-                pub_journal = st.text_input("刊物/专著名称*")
-                pub_cn = st.text_input("刊物CN号/出版社名称")
-                pub_department = st.text_input("刊物主管部门")
-            
-            with col2:
-                pub_issue = st.text_input("期刊、卷期")
-                pub_pages = st.text_input("页码")
-                pub_author = st.text_input("第一作者/通讯作者*")
-                pub_level = st.selectbox(
-                    "刊物等级*",
-                    ["", "SCI", "中文核心期刊", "科技核心", "省级期刊", "其他"]
-                )
-            
-            pub_date = st.date_input("发表时间*")
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                submit_and_continue = st.form_submit_button("✅ 添加到待提交", use_container_width=True)
-            with col2:
-                submit_final = st.form_submit_button("💾 添加并立即提交", type="primary", use_container_width=True)
-            
-            if submit_and_continue or submit_final:
-                if pub_title and pub_author and pub_journal and pub_level:
-                    if submit_and_continue:
-                        pending_data = {
+        
+        pub_date = st.date_input("发表时间*")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            submit_and_continue = st.form_submit_button("✅ 添加到待提交", use_container_width=True)
+        with col2:
+            submit_final = st.form_submit_button("💾 添加并立即提交", type="primary", use_container_width=True)
+        
+        if submit_and_continue or submit_final:
+            if pub_title and pub_author and pub_journal and pub_level:
+                if submit_and_continue:
+                    pending_data = {
+                        "unit_name": unit_name,
+                        "publication_type": pub_type,
+                        "title": pub_title,
+                        "journal": pub_journal,
+                        "cn_number": pub_cn,
+                        "department": pub_department,
+                        "issue": pub_issue,
+                        "pages": pub_pages,
+                        "author": pub_author,
+                        "level": pub_level,
+                        "publication_date": str(pub_date)
+                    }
+                    success, result = save_pending_item("pending_publications", pending_data)
+                    if success:
+                        st.success(f"✅ 已添加到待提交：{pub_title}")
+                        st.info("💡 请点击上方【提交全部待提交内容】按钮完成提交")
+                        st.rerun()
+                    else:
+                        st.error(f"❌ 保存失败: {result}")
+                
+                elif submit_final:
+                    with st.spinner("正在保存数据..."):
+                        data = {
                             "unit_name": unit_name,
                             "publication_type": pub_type,
                             "title": pub_title,
@@ -1506,114 +1624,201 @@ def main():
                             "pages": pub_pages,
                             "author": pub_author,
                             "level": pub_level,
-                            "publication_date": str(pub_date)
+                            "publication_date": str(pub_date),
+                            "created_at": datetime.now().isoformat()
                         }
-                        success, result = save_pending_item("pending_publications", pending_data)
+                        success, result = save_to_supabase("publications", data)
                         if success:
-                            st.success(f"✅ 已添加到待提交：{pub_title}")
-                            st.info("💡 请点击上方【提交全部待提交内容】按钮完成提交")
+                            st.success(f"✅ 成功提交1条论文发表记录！")
                             st.rerun()
                         else:
-                            st.error(f"❌ 保存失败: {result}")
-                    
-                    elif submit_final:
-                        with st.spinner("正在保存数据..."):
-                            data = {
-                                "unit_name": unit_name,
-                                "publication_type": pub_type,
-                                "title": pub_title,
-                                "journal": pub_journal,
-                                "cn_number": pub_cn,
-                                "department": pub_department,
-                                "issue": pub_issue,
-                                "pages": pub_pages,
-                                "author": pub_author,
-                                "level": pub_level,
-                                "publication_date": str(pub_date),
-                                "created_at": datetime.now().isoformat()
-                            }
-                            success, result = save_to_supabase("publications", data)
-                            if success:
-                                st.success(f"✅ 成功提交1条论文发表记录！")
-                                st.rerun()
-                            else:
-                                st.error(f"❌ 提交失败: {result}")
-                else:
-                    st.error("❌ 请填写所有必填项（题目、作者、刊物名称、刊物等级）")
+                            st.error(f"❌ 提交失败: {result}")
+            else:
+                st.error("❌ 请填写所有必填项（题目、作者、刊物名称、刊物等级）")
+
+
+# ========== 提交概览 ==========
+@st.fragment
+def render_overview_tab(unit_name):
+    """提交概览标签页（局部刷新：本页内的操作只重跑本标签页）"""
+    st.subheader("📊 提交概览")
+    st.info("💡 这里显示当前已提交到数据库的数据统计")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    academic_count = len(load_activities("academic_activities", unit_name))
+    popular_count = len(load_activities("popular_activities", unit_name))
+    comp_count = len(load_activities("competitions", unit_name))
+    award_count = len(load_activities("awards", unit_name))
+    
+    with col1:
+        st.metric("学术活动", academic_count)
+    with col2:
+        st.metric("科普活动", popular_count)
+    with col3:
+        st.metric("技能竞赛", comp_count)
+    with col4:
+        st.metric("获奖情况", award_count)
+    
+    col1, col2, col3 = st.columns(3)
+    
+    project_count = len(load_activities("research_projects", unit_name))
+    pub_count = len(load_activities("publications", unit_name))
+    summary_docs = load_summary_documents(unit_name)
+    summary_count = len(summary_docs)
+    
+    with col1:
+        st.metric("科研立项", project_count)
+    with col2:
+        st.metric("论文发表", pub_count)
+    with col3:
+        st.metric("年度总结版本", summary_count)
+    
+    # 显示待提交统计
+    st.markdown("---")
+    st.subheader("⏳ 待提交数据统计")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    # 六个待提交表的计数请求互不依赖，并行发出
+    pending_tables = [
+        "pending_academic_activities",
+        "pending_popular_activities",
+        "pending_competitions",
+        "pending_awards",
+        "pending_research_projects",
+        "pending_publications"
+    ]
+    (pending_academic_count, pending_popular_count, pending_comp_count,
+     pending_award_count, pending_project_count, pending_pub_count) = get_upload_pool().map(
+        lambda table_name: count_rows(table_name, unit_name), pending_tables
+    )
+    
+    with col1:
+        st.metric("待提交学术活动", pending_academic_count)
+    with col2:
+        st.metric("待提交科普活动", pending_popular_count)
+    with col3:
+        st.metric("待提交技能竞赛", pending_comp_count)
+    with col4:
+        st.metric("待提交获奖情况", pending_award_count)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.metric("待提交科研立项", pending_project_count)
+    with col2:
+        st.metric("待提交论文发表", pending_pub_count)
+    
+    total_pending = pending_academic_count + pending_popular_count + pending_comp_count + pending_award_count + pending_project_count + pending_pub_count
+    
+    if total_pending > 0:
+        st.warning(f"⚠️ 您有 {total_pending} 条数据待提交，请前往对应标签页完成提交")
+    
+    st.markdown("---")
+    st.success("✅ 所有已提交数据已保存到云端数据库，管理员可实时查看")
+    st.info("💡 您可以随时重新打开此页面查看和管理已提交的数据，待提交的数据会自动保存，即使刷新页面也不会丢失")
+
+
+# ==================== 主程序 ====================
+
+def main():
+    st.title("💊 揭阳市医学会临床药学分会数据收集系统")
+    st.markdown("---")
+    
+    # 单位信息
+    st.header("📋 单位信息")
+    
+    st.info("💡 **重要提示：** 请各成员单位指定专人负责本单位信息的填报工作，确保数据准确性。填报过程中报错或有任何问题请联系学会秘书（黄晓杰，18318149900）。")
+    
+    unit_name = st.text_input(
+        "请输入单位名称*", 
+        placeholder="例如：揭阳市人民医院", 
+        key="unit_name_input",
+        help="请填写单位全称"
+    )
+    
+    if not unit_name:
+        st.warning("⚠️ 请先填写单位名称后再继续填报")
+        return
+    
+    # 加载该单位的历史数据
+    summary_data = load_unit_summary(unit_name)
+    
+    # 预填联系信息
+    default_contact = summary_data.get('contact_person', '') if summary_data else ''
+    default_phone = summary_data.get('contact_phone', '') if summary_data else ''
+    
+    contact_person = st.text_input(
+        "联系人*", 
+        value=default_contact, 
+        placeholder="请输入联系人姓名",
+        help="请填写负责本单位数据填报的联系人"
+    )
+    
+    contact_phone = st.text_input(
+        "联系电话*", 
+        value=default_phone, 
+        placeholder="请输入11位手机号码",
+        max_chars=11,
+        help="请输入11位手机号码"
+    )
+    
+    # 验证手机号
+    if contact_phone and not validate_phone(contact_phone):
+        st.error("❌ 请输入正确的11位手机号码")
+    
+    # 显示转换后的路径（用于调试）
+    with st.expander("🔍 调试信息（可选查看）"):
+        safe_folder = get_unit_safe_name(unit_name)
+        st.code(f"单位名称: {unit_name}\n文件夹路径: {safe_folder}")
+    
+    st.markdown("---")
+    
+    # 创建标签页
+    tabs = st.tabs([
+        "📄 年度总结与计划",
+        "🎓 学术活动",
+        "📢 科普活动",
+        "🏆 技能竞赛",
+        "🥇 获奖情况",
+        "🔬 科研立项",
+        "📚 论文发表",
+        "📊 提交概览"
+    ])
+    
+    # ========== 年度总结与计划 ==========
+    with tabs[0]:
+        render_summary_tab(unit_name, contact_person, contact_phone)
+    
+    # ========== 学术活动 ==========
+    with tabs[1]:
+        render_academic_tab(unit_name)
+    
+    # ========== 科普活动 ==========
+    with tabs[2]:
+        render_popular_tab(unit_name)
+    
+    # ========== 技能竞赛 ==========
+    with tabs[3]:
+        render_competition_tab(unit_name)
+    
+    # ========== 获奖情况 ==========
+    with tabs[4]:
+        render_award_tab(unit_name)
+    
+    # ========== 科研立项 ==========
+    with tabs[5]:
+        render_project_tab(unit_name)
+    
+    # ========== 论文发表 ==========
+    with tabs[6]:
+        render_publication_tab(unit_name)
     
     # ========== 提交概览 ==========
     with tabs[7]:
-        st.subheader("📊 提交概览")
-        st.info("💡 这里显示当前已提交到数据库的数据统计")
-        
-        col1, col2, col3, col4 = st.columns(4)
-        
-        academic_count = len(get_from_supabase("academic_activities", unit_name))
-        popular_count = len(get_from_supabase("popular_activities", unit_name))
-        comp_count = len(get_from_supabase("competitions", unit_name))
-        award_count = len(get_from_supabase("awards", unit_name))
-        
-        with col1:
-            st.metric("学术活动", academic_count)
-        with col2:
-            st.metric("科普活动", popular_count)
-        with col3:
-            st.metric("技能竞赛", comp_count)
-        with col4:
-            st.metric("获奖情况", award_count)
-        
-        col1, col2, col3 = st.columns(3)
-        
-        project_count = len(get_from_supabase("research_projects", unit_name))
-        pub_count = len(get_from_supabase("publications", unit_name))
-        summary_docs = load_summary_documents(unit_name)
-        summary_count = len(summary_docs)
-        
-        with col1:
-            st.metric("科研立项", project_count)
-        with col2:
-            st.metric("论文发表", pub_count)
-        with col3:
-            st.metric("年度总结版本", summary_count)
-        
-        # 显示待提交统计
-        st.markdown("---")
-        st.subheader("⏳ 待提交数据统计")
-        
-        col1, col2, col3, col4 = st.columns(4)
-        
-        pending_academic_count = len(load_pending_data("pending_academic_activities", unit_name))
-        pending_popular_count = len(load_pending_data("pending_popular_activities", unit_name))
-        pending_comp_count = len(load_pending_data("pending_competitions", unit_name))
-        pending_award_count = len(load_pending_data("pending_awards", unit_name))
-        
-        with col1:
-            st.metric("待提交学术活动", pending_academic_count)
-        with col2:
-            st.metric("待提交科普活动", pending_popular_count)
-        with col3:
-            st.metric("待提交技能竞赛", pending_comp_count)
-        with col4:
-            st.metric("待提交获奖情况", pending_award_count)
-        
-        col1, col2 = st.columns(2)
-        
-        pending_project_count = len(load_pending_data("pending_research_projects", unit_name))
-        pending_pub_count = len(load_pending_data("pending_publications", unit_name))
-        
-        with col1:
-            st.metric("待提交科研立项", pending_project_count)
-        with col2:
-            st.metric("待提交论文发表", pending_pub_count)
-        
-        total_pending = pending_academic_count + pending_popular_count + pending_comp_count + pending_award_count + pending_project_count + pending_pub_count
-        
-        if total_pending > 0:
-            st.warning(f"⚠️ 您有 {total_pending} 条数据待提交，请前往对应标签页完成提交")
-        
-        st.markdown("---")
-        st.success("✅ 所有已提交数据已保存到云端数据库，管理员可实时查看")
-        st.info("💡 您可以随时重新打开此页面查看和管理已提交的数据，待提交的数据会自动保存，即使刷新页面也不会丢失")
+        render_overview_tab(unit_name)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,21 @@
+-- work_summary 按 unit_name 唯一，供 upsert(on_conflict="unit_name") 使用
+-- 先删除重复单位的旧记录（保留 updated_at 最新的一条），再添加唯一约束
+BEGIN;
+
+DELETE FROM work_summary
+WHERE id IN (
+    SELECT id FROM (
+        SELECT id,
+               row_number() OVER (
+                   PARTITION BY unit_name
+                   ORDER BY updated_at DESC NULLS LAST, id DESC
+               ) AS rn
+        FROM work_summary
+    ) ranked
+    WHERE ranked.rn > 1
+);
+
+ALTER TABLE work_summary
+    ADD CONSTRAINT work_summary_unit_name_key UNIQUE (unit_name);
+
+COMMIT;